@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# ! /usr/bin/env python
+"""
+Rename the emlid archives (a0_file_renaming.py) and extract the files required for PPK processing
+(a1_ppk_preprocessing.py) for many survey days at once. Each survey directory is processed in its own worker process,
+which reads and writes only the yaml configuration file of its directory.
+
+Inputs:
+    SURVEY_DIRS: Glob pattern, or list of glob patterns, of the raw emlid directories to process
+
+Outputs:
+    Same as a0_file_renaming.py and a1_ppk_preprocessing.py, for each survey directory
+    Summary of the processing status of each survey day
+"""
+
+import concurrent.futures
+import glob
+import logging
+import os
+import time
+import traceback
+
+import pandas as pd
+
+from a0_file_renaming import rename_archives
+from a1_ppk_preprocessing import extract_ppk
+from salvo.naming import get_date
+
+__author__ = "Marc Oggier"
+
+# -- USER VARIABLE
+SURVEY_DIRS = ["/mnt/data/UAF-data/raw/SALVO/2024*/emlid/"]
+N_WORKERS = os.cpu_count()
+RENAME = True
+EXTRACT = True
+
+logger = logging.getLogger(__name__)
+
+
+def process_survey(emlid_dir, rename=RENAME, extract=EXTRACT):
+    """
+    Rename the archives and extract the files required for PPK processing of a survey directory
+    :param emlid_dir: string
+        Raw emlid directory of the survey
+    :param rename: boolean
+        If True, rename the emlid archives
+    :param extract: boolean
+        If True, extract the files required for PPK processing
+    :return summary: dict
+        Processing status of the survey, with the number of renamed archives and extracted files
+    """
+    summary = {
+        "date": get_date(emlid_dir),
+        "directory": emlid_dir,
+        "status": "success",
+        "renamed": 0,
+        "extracted": 0,
+        "error": None,
+    }
+    t_start = time.time()
+    try:
+        if rename:
+            summary["renamed"] = len(rename_archives(emlid_dir, dry_run=False))
+        if extract:
+            summary["extracted"] = len(extract_ppk(emlid_dir, display=False))
+    except Exception as e:  # pylint: disable=broad-except
+        summary["status"] = "failure"
+        summary["error"] = repr(e)
+        logger.error(str(emlid_dir + ":\n" + traceback.format_exc()))
+    summary["duration(s)"] = round(time.time() - t_start, 1)
+    return summary
+
+
+if __name__ == "__main__":
+    if isinstance(SURVEY_DIRS, str):
+        SURVEY_DIRS = [SURVEY_DIRS]
+    emlid_dirs = sorted({d for pattern in SURVEY_DIRS for d in glob.glob(pattern)})
+    logger.info("Processing %d survey directories", len(emlid_dirs))
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=N_WORKERS) as executor:
+        summaries = list(executor.map(process_survey, emlid_dirs))
+
+    summary_df = pd.DataFrame(summaries).set_index("date").sort_index()
+    print(summary_df.drop(columns=["directory"]).to_string())
+    if (summary_df["status"] == "failure").any():
+        print(summary_df.loc[summary_df["status"] == "failure", ["directory", "error"]])
@@ -7,7 +7,7 @@ Inputs:
         - A yaml configuration file containing at least information about site, location
 
 Outputs:
-    - Copy of the original zip-archives file under ./original/
+    - Copy of the original zip-archives file under ./original/, hardlinked from the content-addressed store
     - Zip-archives file containing updated file and directory names
     - A yaml configuration file containing information about site, location, and the history of filename change as a
       dictionary entry within the yaml configuration file
@@ -18,180 +18,210 @@ Outputs:
 
 import os
 import logging
-import shutil
 import zipfile
 import yaml
-import pandas as pd
+from salvo.file import rinex, ubx
+from salvo.file.archive import list_members, open_member, plan_rename, rename_members
 from salvo.naming import emlid
+from salvo.file.store import RawStore
 
 __author__ = "Marc Oggier"
 
+logger = logging.getLogger(__name__)
+
 EMLID_DIR = "/mnt/data/UAF-data/raw/SALVO/20240525-ARM/emlid/"
 EMLID_DIR = "/mnt/data/UAF-data/raw/SALVO/20240526-ICE/emlid/"
 EMLID_DIR = "/mnt/data/UAF-data/raw/SALVO/20240527-ARM/emlid/"
 EMLID_DIR = "/mnt/data/UAF-data/raw/SALVO/20240528-ARM/emlid/"
 EMLID_DIR = "/mnt/data/UAF-data/raw/SALVO/20240529-BEO/emlid/"
 EMLID_DIR = "/mnt/data/UAF-data/raw/SALVO/20240530-ICE/emlid/"
+# Content-addressed store of the raw data, on the same file system to allow hardlinks
+STORE_DIR = "/mnt/data/UAF-data/raw/SALVO/.store/"
+# Print the renaming plan of each archive, without writing any file
+DRY_RUN = False
+
+
+def member_name(file, site, location, spl_rate):
+    """
+    Return the name of an archive member according to SALVO-2024 naming convention
+    :param file: string
+        Member name
+    :param site: string
+        Site name
+    :param location: string
+        Location name
+    :param spl_rate: float or None
+        Sampling rate in Hz
+    :return: string or None
+        New member name, None for directories which are dropped
+    """
+    # skip directory
+    if file.endswith("/"):
+        return None
+    # Check if file is in level-1 subdirectory
+    if "/" in file:
+        if len(list(filter(None, file.split("/")))) > 2:
+            print("TODO: only 1 level subdirectory has been implemented")
+            return file
+        new_subdir = emlid.create_emlid_name(
+            file.split("/")[0], site, location, spl_rate
+        )
+        org_fn = file.split("/")[-1]
+    else:
+        new_subdir = None
+        org_fn = file
+    target_fn = (
+        emlid.create_emlid_name(org_fn.split(".")[0], site, location, spl_rate)
+        + "."
+        + org_fn.split(".")[-1]
+    )
+    return "/".join(filter(None, [new_subdir, target_fn]))
+
+
+def rename_archives(emlid_dir, store_dir=STORE_DIR, dry_run=DRY_RUN):
+    """
+    Rename the emlid zip-archives of a survey directory, and their members, according to SALVO-2024 naming
+    convention. The name history is added to the yaml configuration file of the directory.
+    :param emlid_dir: string
+        Directory containing the emlid zip-archives and the yaml configuration file
+    :param store_dir: string
+        Directory of the content-addressed store of the raw data
+    :param dry_run: boolean
+        If True, print the renaming plan of each archive without writing any file
+    :return renamed: dict
+        Dictionary with the original archive name as key and the new archive name as value
+    """
+    # Create `original` directory if it does not exist
+    org_dir = os.path.join(emlid_dir, "original")
+    if not os.path.exists(org_dir):
+        os.makedirs(org_dir)
+
+    # Read configuration file if exists. Return error if not
+    config = {}
+    for file in os.listdir(emlid_dir):
+        if file.endswith("yaml"):
+            with open(os.path.join(emlid_dir, file), "r", encoding="UTF-8") as yf:
+                config = yaml.safe_load(yf)
+            config_fp = os.path.join(emlid_dir, file)
+            break
+    if len(config) == 0:
+        logger.error("No yaml configuration file was found")
+        raise FileNotFoundError(str("No yaml configuration file in " + emlid_dir))
+
+    # Hash the zip-archives in the content-addressed store
+    store = RawStore(store_dir)
+    zip_fps = [
+        item.path
+        for item in os.scandir(emlid_dir)
+        if item.is_file()
+        and not item.name.startswith("salvo_")
+        and item.name.endswith(".zip")
+    ]
+    if not dry_run:
+        store.add(zip_fps)
+
+    renamed = {}
+    # Link zip-archived to `original` subdirectory if it does not exist
+    # Loop through all file in directory
+
+    for item in os.scandir(emlid_dir):
+        if (
+            item.is_file()
+            and not item.name.startswith("salvo_")
+            and item.name.endswith(".zip")
+        ):
+            zip_fp = item.path  # zip filepath
+            bkp_fp = os.path.join(org_dir, item.name)  # backup filepath
+            # check if backup file does not exit
+            if not os.path.exists(bkp_fp) and not dry_run:
+                store.link(zip_fp, bkp_fp)  # backup the original filename, without copy
+            SITE = config["site"]
+            if isinstance(SITE, list):
+                SITE = "-".join(SITE)
+            LOC = "-".join(config["location"])
+            LOC = config["site"]
+            if isinstance(LOC, list):
+                LOC = "-".join(LOC)
+            with zipfile.ZipFile(zip_fp) as archive:
+                # Check for sampling rate for RINEX archive
+                if "rinex" in os.path.basename(zip_fp.lower()):
+                    # check for sampling in observation file:
+                    obs_file = [
+                        file for file in archive.namelist() if file.endswith("24O")
+                    ][-1]
+                    # scan the observation file header, or epochs, for the sampling interval [in second]
+                    with open_member(archive, obs_file) as f:
+                        spl_interval = rinex.sampling_interval(f)
+                    if spl_interval is not None:
+                        SPL_RATE = 1 / spl_interval
+                    else:
+                        SPL_RATE = None
+                        logger.warning(
+                            str("Sampling interval not define in " + obs_file)
+                        )
+                elif "ubx" in os.path.basename(zip_fp.lower()):
+                    # scan the raw UBX log epochs for the sampling interval [in second], without RINEX conversion
+                    ubx_files = list_members(archive, ["UBX", "ubx"])
+                    spl_interval = None
+                    if ubx_files:
+                        with open_member(archive, ubx_files[-1]) as f:
+                            spl_interval = ubx.sampling_interval(f)
+                    if spl_interval is not None:
+                        SPL_RATE = 1 / spl_interval
+                    else:
+                        SPL_RATE = None
+                        logger.warning(
+                            str("Sampling interval not define in " + item.name)
+                        )
+                else:
+                    SPL_RATE = None
 
+                BASENAME = emlid.create_emlid_name(item.name, SITE, LOC, SPL_RATE)
+                new_zip_fn = BASENAME + ".00.zip"
+                new_zip_fp = os.path.join(emlid_dir, new_zip_fn)
 
-# Create `original` directory if it does not exist
-org_dir = os.path.join(EMLID_DIR, "original")
-if not os.path.exists(org_dir):
-    os.makedirs(org_dir)
+                def rename(file):
+                    return member_name(file, SITE, LOC, SPL_RATE)
 
-# -- PROCESS
-logger = logging.getLogger(__name__)
+                if dry_run:
+                    print(item.name + " -> " + new_zip_fn)
+                    for old_name, new_name in plan_rename(archive, rename):
+                        print("    " + old_name + " -> " + str(new_name))
+                    continue
 
-# Read configuration file if exists. Return error if not
-config = {}
-for file in os.listdir(EMLID_DIR):
-    if file.endswith("yaml"):
-        with open(os.path.join(EMLID_DIR, file), "r", encoding="UTF-8") as yf:
-            config = yaml.safe_load(yf)
-        config_fp = os.path.join(EMLID_DIR, file)
-        break
-if len(config) == 0:
-    logger.error("No yaml configuration file was found")
-
-# Copy zip-archived to `original` subdirectory if it does not exist
-# Loop through all file in directory
-
-for item in os.scandir(EMLID_DIR):
-    if (
-        item.is_file()
-        and not item.name.startswith("salvo_")
-        and item.name.endswith(".zip")
-    ):
-        zip_fp = item.path  # zip filepath
-        bkp_fp = os.path.join(org_dir, item.name)  # backup filepath
-        if not os.path.exists(bkp_fp):  # check if backup file does not exit
-            shutil.copy(zip_fp, bkp_fp)  # backup a copy of the original filename
-        SITE = config["site"]
-        if isinstance(SITE, list):
-            SITE = "-".join(SITE)
-        LOC = "-".join(config["location"])
-        LOC = config["site"]
-        if isinstance(LOC, list):
-            LOC = "-".join(LOC)
-        with zipfile.ZipFile(zip_fp) as archive:
-            # Check for sampling rate for RINEX archive
-            if "rinex" in os.path.basename(zip_fp.lower()):
-                # check for sampling in observation file:
-                obs_file = [
-                    file for file in archive.namelist() if file.endswith("24O")
-                ][-1]
-                # read observation file content
-                content = zipfile.Path(archive, at=obs_file).read_text(encoding="UTF-8")
-                # look for sampling interval at line 18 [in second]
-                if (
-                    list(filter(None, content.split("\n")[17].split(" ")))[1]
-                    == "INTERVAL"
-                ):
-                    spl_interval = float(
-                        list(filter(None, content.split("\n")[17].split(" ")))[0]
-                    )
-                    SPL_RATE = f"{1/spl_interval:02.0f}Hz"
-                elif (
-                    len([line for line in content.split("\n") if line.startswith(">")])
-                    > 2
-                ):
-                    # parse text file, looking for date row entry starting with '>'
-                    lines = [
-                        line for line in content.split("\n") if line.startswith(">")
-                    ]
-                    data = [
-                        list(filter(None, line[1:].split(" ")))[0:6] for line in lines
-                    ]
-                    data = pd.DataFrame(
-                        data,
-                        columns=["year", "month", "day", "hour", "minute", "second"],
-                    )
-                    data = pd.to_datetime(data)
-                    # compute sampling frequency
-                    spl_interval = (
-                        data.diff().median().seconds
-                        + data.diff().median().microseconds / 1e6
+                # copy the compressed members under their new name, while conserving directory structure
+                rename_members(zip_fp, new_zip_fp, rename)
+
+                # Clean unneeded file in directory
+                if os.path.exists(
+                    new_zip_fp
+                ):  # check if zip file was created successfully
+                    os.remove(zip_fp)  # then delete old zipfile
+                    print(
+                        new_zip_fn + " was created successfully. Cleaning raw directory"
                     )
-                    SPL_RATE = 1 / spl_interval
+
+                renamed[item.name] = new_zip_fn
+                # Add name history record in config file:
+                if "name history" not in config.keys():
+                    config["name history"] = {item.name: new_zip_fn}
                 else:
-                    SPL_RATE = None
-                    logger.warning(str("Sampling interval not define in " + obs_file))
-            else:
-                SPL_RATE = None
-
-            BASENAME = emlid.create_emlid_name(item.name, SITE, LOC, SPL_RATE)
-            extract_dir = os.path.join(EMLID_DIR, BASENAME)
-
-            # loop through the file in the archive, rename during extraction, while conserving directory structure
-            for file in archive.namelist():
-                # Check if file is in level-1 subdirectory
-                if "/" in file[:-1]:
-                    if len(list(filter(None, file.split("/")))) > 2:
-                        print("TODO: only 1 level subdirectory has been implemented")
+                    if "name history" not in config:
+                        config["name history"][item.name] = new_zip_fn
+                    if config["name history"] is None:
+                        config["name history"] = {}
+                        config["name history"][item.name] = new_zip_fn
+                    elif item.name not in config["name history"]:
+                        config["name history"][item.name] = new_zip_fn
                     else:
-                        org_subdir = file.split("/")[0]
-                        NEW_SUBDIR = emlid.create_emlid_name(
-                            file.split("/")[0], SITE, LOC, SPL_RATE
-                        )
-                        org_fn = file.split("/")[-1]
-                # skip directory
-                elif "/" in file[-1]:
-                    continue
-                else:
-                    NEW_SUBDIR = None
-                    org_fn = file
-                target_fn = (
-                    emlid.create_emlid_name(org_fn.split(".")[0], SITE, LOC, SPL_RATE)
-                    + "."
-                    + org_fn.split(".")[-1]
-                )
-                # target filename
-                target_fp = os.path.join(
-                    extract_dir, "/".join(filter(None, [NEW_SUBDIR, target_fn]))
-                )
-                # create subdirectory if it does not exist
-                if not os.path.exists(os.path.dirname(target_fp)):
-                    os.makedirs(os.path.dirname(target_fp))
-                # open the output path and save content to the file
-                with open(target_fp, "wb") as f:
-                    f.write(archive.read(file))
-
-            # create zip archive with files and subdirectories named according to SALVO-2024 name convention
-            new_zip_fn = BASENAME + ".00.zip"
-            new_zip_fp = os.path.join(EMLID_DIR, new_zip_fn)
-
-            # open the output path, and save content to files
-            with zipfile.ZipFile(new_zip_fp, "w") as zip_object:
-                # Traverse all files in directory
-                rootlen = len(extract_dir) + 1
-                for folder_name, sub_folders, file_names in os.walk(extract_dir):
-                    for filename in file_names:
-                        # Create filepath of files in directory
-                        file_path = os.path.join(folder_name, filename)
-                        # Add files to zip file
-                        zip_object.write(
-                            file_path, file_path[rootlen:]
-                        )  # Add files to zip file
-
-            # Clean unneeded file in directory
-            if os.path.exists(new_zip_fp):  # check if zip file was created successfully
-                os.remove(zip_fp)  # then delete old zipfile
-                shutil.rmtree(extract_dir)  # then delete the extraction folder
-                print(new_zip_fn + " was created successfully. Cleaning raw directory")
-
-            # Add name history record in config file:
-            if "name history" not in config.keys():
-                config["name history"] = {item.name: new_zip_fn}
-            else:
-                if "name history" not in config:
-                    config["name history"][item.name] = new_zip_fn
-                if config["name history"] is None:
-                    config["name history"] = {}
-                    config["name history"][item.name] = new_zip_fn
-                elif item.name not in config["name history"]:
-                    config["name history"][item.name] = new_zip_fn
-                else:
-                    continue
+                        continue
+
+    if not dry_run:
+        with open(os.path.join(emlid_dir, config_fp), "w", encoding="UTF-8") as yaml_f:
+            yaml.dump(config, yaml_f)
+        store.save()
+    return renamed
+
 
-with open(os.path.join(EMLID_DIR, config_fp), "w", encoding="UTF-8") as yaml_f:
-    yaml.dump(config, yaml_f)
+if __name__ == "__main__":
+    rename_archives(EMLID_DIR)
@@ -23,12 +23,13 @@ Outpus:
 import os
 import logging
 from shutil import move
-from datetime import timedelta
 
 import pandas as pd
-import pyproj
 import yaml
 
+from salvo.analysis.projection import transform
+from salvo.file import rinex
+from salvo.file.pos import PPK_COLUMNS, read_pos
 from salvo.naming import get_date
 from salvo.naming.folder import list_files_walk
 
@@ -43,8 +44,6 @@ EMLID_DIR = "/mnt/data/UAF-data/working_a/SALVO/20240527-ARM/emlid"
 
 DISPLAY = True
 LOCAL_EPSG = 3338
-# GPST-UTC Offset
-DELTA_T = timedelta(seconds=18)
 logger = logging.getLogger(__name__)
 
 # Load the configuration file
@@ -76,17 +75,8 @@ for item in os.scandir(os.path.join(EMLID_DIR, SUBDIR)):
         obs_files = [file for file in os.listdir(item.path) if file.endswith("24O")]
         spl_rates = {}
         for file in obs_files:
-            with open(os.path.join(EMLID_DIR, item, file), "r", encoding="UTF-8") as f:
-                content = f.read()
-            # parse text file, looking for date row entry starting with '>'
-            lines = [line for line in content.split("\n") if line.startswith(">")]
-            data = [list(filter(None, line[1:].split(" ")))[0:6] for line in lines]
-            data = pd.DataFrame(
-                data, columns=["year", "month", "day", "hour", "minute", "second"]
-            )
-            date = pd.to_datetime(data, format="%Y%m%d%H%M%S.%f")
-            # compute sampling frequency
-            spl_interval = date.diff().median().microseconds / 1e6
+            # compute sampling frequency from the epoch records
+            spl_interval = rinex.sampling_interval(os.path.join(item.path, file))
             spl_rates[file.split(".")[0]] = 1 / spl_interval
 
         # Move file from subdirectory to root directory, adding sampling frequency
@@ -164,55 +154,14 @@ for file in sorted(pos_fns):
 for file in os.listdir(EMLID_DIR):
     if file.endswith("a1.pos") and len(file.split(".")) == 3:
         ppk_fp = os.path.join(EMLID_DIR, file)
-        ppk_df = pd.read_csv(ppk_fp, sep=r"\s+", header=[0])
-        ppk_df = pd.read_csv(ppk_fp, sep=",", header=[0])
-
-        ppk_df.rename(columns={"%": "Date"}, inplace=True)
-
-        # Compute Timestamp from date (Date) and time (GPST or UTC).
-        if "GPST" in ppk_df.columns:
-            ppk_df["Time"] = ppk_df["GPST"] + DELTA_T
-            logger.info(
-                str(file + ": dropping GPST columns, after converting GPST time to UTC")
-            )
-        else:
-            ppk_df["Time"] = ppk_df["UTC"]
-            ppk_df.drop(columns=["UTC"], inplace=True)
-            logger.info(str(file + ": dropping UTC columns"))
-        ppk_df["Timestamp"] = pd.to_datetime(
-            ppk_df["Date"] + " " + ppk_df["Time"], format="%Y/%m/%d %H:%M:%S.%f"
-        )
-        # Convert Timestamp to ISO8601
-        ppk_df["Timestamp"] = pd.to_datetime(ppk_df["Timestamp"], format="ISO8601")
-        # Remove unnecessary date and time columns (Date, GPST)
-        ppk_df.drop(["Date", "Time"], axis=1, inplace=True)
-
-        # Rename columns to match magnaprobe:
-        columns_name = {
-            "latitude(deg)": "Latitude",
-            "longitude(deg)": "Longitude",
-            "height(m)": "Altitude",
-            "Q": "QualityFix",
-            "ns": "NSatellite",
-            "sdn(m)": "SdN",
-            "sde(m)": "SdE",
-            "sdu(m)": "SdU",
-            "sdne(m)": "SdNE",
-            "sdeu(m)": "SdEU",
-            "sdun(m)": "SdUN",
-            "age(s)": "Age",
-            "ratio": "Ratio",
-        }
-        columns_name = {
-            key: val for key, val in columns_name.items() if key in ppk_df.columns
-        }
-        ppk_df.rename(columns=columns_name, inplace=True)
+        # Timestamp is converted from GPST to UTC, if needed
+        ppk_df = read_pos(ppk_fp, rename=PPK_COLUMNS)
+        logger.info(str(file + ": Timestamp in " + ppk_df.attrs["time_system"]))
 
         # Convert lat/lon toward X, Y and Z
-        xform = pyproj.Transformer.from_crs("4326", LOCAL_EPSG)
-        ppk_df[["X", "Y"]] = pd.DataFrame(
-            xform.transform(ppk_df["Latitude"], ppk_df["Longitude"])
-        ).transpose()
+        ppk_df["X"], ppk_df["Y"] = transform(
+            ppk_df["Latitude"], ppk_df["Longitude"], target=LOCAL_EPSG
+        )
         ppk_df["Z"] = ppk_df["Altitude"]
 
         # Write PPK position
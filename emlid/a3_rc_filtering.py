@@ -3,34 +3,29 @@
 """
 This script performed tasks,
 
-- Move and renamed UBX files which were converted to RINEX from `ubx` directory to `rinex` directory
-- Move and rename all the POS position in the emlid directory and subdirectory
-- Add location and event files with the highest sampling rate to config file
 - Apply a RC-like filter to remove mechanical bouncing that triggered multiple event signals on a short
 time (Dt < 0.1 s)
+- Replace the event file in the config file by the filtered event file
 
 
 Inputs:
     EMLID_DIR: Directory containing
-        - the emlid archive file as downloaded from the emlid instrument
+        - the event position file (.aN.pos) referenced in the yaml configuration file
         - a yaml configuration file containing information about site and location
 
 Outpus:
-    Archive file containing updated file and directory names.
-    History of file changes is kept as a dictionary entry within the yaml configuration file
+    Filtered event position file (.aN+1.pos), with a single event per trigger
+    Number of dropped triggers is kept as a dictionary entry within the yaml configuration file
 """
 
 import os
 import logging
-from shutil import move
-from datetime import timedelta
 
-import pandas as pd
-import pyproj
 import yaml
 
-from salvo.naming import get_date
-from salvo.naming.folder import list_files_walk
+from salvo.analysis.debounce import Debouncer
+from salvo.file.pos import iter_pos
+from salvo.naming import output_filename
 
 __author__ = "Marc Oggier"
 
@@ -38,6 +33,13 @@ __author__ = "Marc Oggier"
 EMLID_DIR = "/mnt/data/UAF-data/working_a/SALVO/20240420-BEO/emlid"
 EMLID_DIR = "/mnt/data/UAF-data/working_a/SALVO/20240525-ARM/emlid"
 
+# Triggers closer than DEAD_TIME to the previous trigger are bouncing
+DEAD_TIME = "0.1s"
+# Keep the 'first' trigger of each burst, or the one with the 'best' quality fix
+POLICY = "best"
+# Number of events read at once
+CHUNKSIZE = 100_000
+
 logger = logging.getLogger(__name__)
 
 # Load the configuration file
@@ -53,3 +55,36 @@ if len(config) == 0:
 
 event_fn = config["position"]["event"]
 event_fp = os.path.join(EMLID_DIR, event_fn)
+
+# RC-like filtering for event location
+out_fp = output_filename(event_fp)
+debouncer = Debouncer(DEAD_TIME, policy=POLICY, quality_column="QualityFix")
+with open(out_fp, "w", encoding="utf-8") as f:
+    header = True
+    for chunk in iter_pos(event_fp, chunksize=CHUNKSIZE, rename=False):
+        debouncer.filter(chunk).to_csv(f, index=False, header=header)
+        header = False
+    debouncer.flush().to_csv(f, index=False, header=header)
+logger.info(
+    "%s: %d of %d triggers dropped",
+    event_fn,
+    debouncer.n_dropped,
+    debouncer.n_triggers,
+)
+
+# Add filter history record in config file
+out_fn = os.path.basename(out_fp)
+if config.get("filter history") is None:
+    config["filter history"] = {}
+config["filter history"][event_fn] = {
+    "output": out_fn,
+    "dead time": DEAD_TIME,
+    "policy": POLICY,
+    "triggers": debouncer.n_triggers,
+    "dropped": debouncer.n_dropped,
+}
+config["position"]["event"] = out_fn
+
+# Save config file
+with open(CONFIG_FP, "w", encoding="utf-8") as f:
+    yaml.dump(config, f)
@@ -35,6 +35,9 @@ from matplotlib.lines import Line2D
 import tkinter as tk
 from tkinter import filedialog
 
+from salvo.analysis.geodesic import inverse as geodesic_inverse
+from salvo.file.cache import read_positions
+
 
 def process(writeFlag, plotTitle, survey_pts_csv_fn, ppk_pos_fn):
     # Check if a file was selected
@@ -53,15 +56,8 @@ def process(writeFlag, plotTitle, survey_pts_csv_fn, ppk_pos_fn):
     # Load the Files
     print("Loading: %s" % survey_pts_csv_fn)
     survey_pts = pd.read_csv(survey_pts_csv_fn, header=0)
-    header = "Date GPST latitude(deg) longitude(deg)  height(m)   Q  ns   sdn(m)   sde(m)   sdu(m)  sdne(m)  sdeu(m)  sdun(m) age(s)  ratio"
     print("Loading: %s" % ppk_pos_fn)
-    ppk_pos = pd.read_csv(
-        ppk_pos_fn,
-        comment="%",
-        delim_whitespace=True,
-        names=header.split(),
-        parse_dates=[[0, 1]],
-    )
+    ppk_pos = read_positions(ppk_pos_fn, utc=False, rename=False)
 
     ### Format the dataFrames
     ## Round the MagnaProbe timestamp to match nearest 5Hz rate
@@ -73,10 +69,8 @@ def process(writeFlag, plotTitle, survey_pts_csv_fn, ppk_pos_fn):
         - timedelta(seconds=18)
     )
     survey_pts["DateTime"] = survey_pts["TIMESTAMP2"].dt.round("200ms")
-    ## Format the Emlid pos file and convert from GPST to UTC
-    ppk_pos["DateTime"] = pd.to_datetime(
-        ppk_pos["Date_GPST"], format="%Y-%m-%d %H:%M:%S.%f"
-    )
+    ## Emlid pos file timestamp, in GPST
+    ppk_pos["DateTime"] = ppk_pos["Timestamp"]
     outDF = pd.merge(survey_pts, ppk_pos, on="DateTime", how="left")
 
     ##Format Output to match original magnaProbe format
@@ -406,14 +400,11 @@ def xyComp(plotTitle, outDF):
     outDF["Lon"] = outDF.apply(
         lambda row: dms_to_dd(row["ggalongitude"], row["ggae_w_ind"]), axis=1
     )
-    # Apply the geodesic function to each row to calculate 'Diff(m)'
-    outDF["xyDiff(m)"] = outDF.apply(
-        lambda row: calculate_distance_geodesic(
-            row["Lat"], row["Lon"], row["latitude(deg)"], row["longitude(deg)"]
-        ),
-        axis=1,
+    # Compute the geodesic distance for all rows at once to calculate 'Diff(m)'
+    outDF["xyDiff(m)"], _ = geodesic_inverse(
+        outDF["Lat"], outDF["Lon"], outDF["latitude(deg)"], outDF["longitude(deg)"]
     )
-    # outDF['xyDiff(m)'] = outDF.apply(lambda row: haversine(row['Lon'], row['Lat'], row['longitude(deg)'], row['latitude(deg)']), axis=1)
+    # outDF["xyDiff(m)"], _ = geodesic_inverse(outDF["Lat"], outDF["Lon"], outDF["latitude(deg)"], outDF["longitude(deg)"], method="haversine")
 
     # Create the figure layout
     fig = plt.figure(figsize=(10, 12))
@@ -21,8 +21,7 @@ output_dir = input_dir.replace('raw', 'working_a')
 if not os.path.exists(output_dir):
     os.makedirs(output_dir)
 
-filelists = file.list_folder_recursive(input_dir)  # list all files recursively
-files = file.select_extension(filelists, 'csv')  # select csv files
+files = list(file.walk_files(input_dir, extensions='csv'))  # list csv files recursively
 
 # Look for hobo logger name of shape X_Y (like ICE_1, BEO_TRH), exception for ICE6:
 sensor_fp_d = {}
@@ -20,6 +20,9 @@ import numpy as np
 
 from cmcrameri import cm
 
+from salvo.analysis import chainage, enu
+from salvo.naming import parse_name
+
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +32,11 @@ PLOT_ORIGIN_FLAG = True
 NPOINTS = 201
 TARGET_DIST = 1
 MODE = None
+# Number of bins along the track to fit the longline reference line, and file caching the reference lines by site
+LONGLINE_BINS = 10
+REFERENCE_LINE_FP = "/mnt/data/UAF-data/working_a/SALVO/salvo_reference_line.yaml"
+# File storing the origin of the local ENU frame of each site
+SITE_FP = "/mnt/data/UAF-data/working_a/SALVO/salvo_site.yaml"
 
 # Data filename
 QC_FP = "/mnt/data/UAF-data/working_a/SALVO/20240419-ARM/magnaprobe/salvo_arm_line_magnaprobe-geodel_20240419.a2.csv"
@@ -107,18 +115,31 @@ endtime = qc_data.Timestamp.max().isoformat()
 config["starttime"] = starttime
 config["endtime"] = endtime
 
+# Record the origin of the site local frame, shared by all the surveys of the site
+llh = qc_data.reindex(columns=["Latitude", "Longitude", "Altitude"])
+origin = enu.reference_origin(
+    parse_name(QC_FP).site,
+    llh.fillna({"Altitude": 0}).to_numpy(dtype=float),
+    site_fp=SITE_FP,
+)
+config["origin"] = enu.origin_entry(origin)
+
 # MODE DETECTION:
 
 # Insert LineLocation
 if "longline" in os.path.basename(QC_FP):
-    # TODO: implement longline
     # Since the longline transect and the library is measured without a fixed distance, we don't check for the distance
     qc_data.loc[qc_data["QC_flag"] == 8, "QC_flag"] = 1
-    logger.error("other mode are not implemented")
-    if "LineLocation" not in qc_data.columns:
-        qc_data["LineLocation"] = [np.nan] * len(qc_data)
-    else:
-        qc_data = qc_data.sort_values(by=["LineLocation"])
+    if "LineLocation" not in qc_data.columns or qc_data["LineLocation"].isna().all():
+        # Project points on the site reference line, fitted on the first processed survey
+        SITE = parse_name(QC_FP).site
+        qc_data[["LineLocation", "LineOffset"]] = chainage.compute_chainage(
+            qc_data,
+            name=SITE + "_longline",
+            n_bins=LONGLINE_BINS,
+            cache_fp=REFERENCE_LINE_FP,
+        )
+    qc_data = qc_data.sort_values(by=["LineLocation"])
 
     qc_data.loc[qc_data["SnowDepth"] < 0, "SnowDepth"] = 0
 
@@ -216,8 +237,9 @@ mt.export.data(qc_data, output_fp)
 
 fig_fp = output_fp.split(".")[0] + ".pdf"
 # Plot basic figures:
-site = output_fp.split("_")[2].upper()
-date = output_fp.split(".")[0][-8:]
+output_name = parse_name(output_fp)
+site = output_name.site.upper()
+date = output_name.datetime.strftime("%Y%m%d")
 if "_longline" in output_fp:
     NAME = "Long transect"
 elif "_line" in output_fp:
@@ -39,7 +39,9 @@ import pandas as pd
 from scipy.stats import linregress
 import yaml
 
-from salvo.analysis import distance
+from salvo.analysis import distance, enu
+from salvo.file.cache import read_positions
+from salvo.file.pos import PPK_COLUMNS
 
 # Filepath to data
 MAGNA_FP = "/mnt/data/UAF-data/working_a/SALVO/20240530-ICE/magnaprobe/salvo_ice_line_magnaprobe-geodel_20240530.a1.dat"
@@ -47,6 +49,7 @@ EMLID_FP = "/mnt/data/media/photography/SALVO/working_a/20240530-ICE/emlid/ubx/r
 
 # Perform GPS comparison analysis, and display figure
 DISPLAY = True
+LOCAL_EPSG = 3338
 
 # Timeoffset between emlid and magnaprobe
 OFFSET = timedelta(hours=0, seconds=0)
@@ -84,8 +87,20 @@ utc_endtime = (
 
 # Load position file
 print("Loading: ", EMLID_FP)
-pos_df = pd.read_csv(EMLID_FP, header=9)
-pos_df["Timestamp"] = pd.to_datetime(pos_df["timestamp"], format="ISO8601")
+# Load ppk position file within the MagnaProbe survey time window, with the PPK column names (QualityFix, SdNE, ...)
+# and converted to XYZ, from the cache after the first run
+pos_df = read_positions(
+    EMLID_FP,
+    rename=PPK_COLUMNS,
+    epsg=LOCAL_EPSG,
+    start=utc_starttime,
+    end=utc_endtime,
+)
+# Local ENU coordinates around the site origin recorded in the MagnaProbe configuration by a1_formatting
+pos_df[["E", "N", "U"]] = enu.compute_enu(
+    pos_df, origin=enu.site_origin(config["magna"])
+)
+
 pos_freq = pos_df["Timestamp"].diff().median()
 
 pos_df["Timestamp"] = pos_df["Timestamp"].apply(lambda x: x.round(pos_freq))
@@ -40,7 +40,8 @@ from scipy.stats import linregress
 import yaml
 import geopy
 
-from salvo.analysis import distance
+from salvo.analysis import distance, enu, matching
+from salvo.file.cache import read_positions
 
 # Filepath to data
 MAGNA_FP = "/mnt/data/UAF-data/working_a/SALVO/20240608-BEO/magnaprobe/salvo_beo_line_magnaprobe-geodel_20240608.a2.csv"
@@ -50,6 +51,9 @@ EMLID_FP = (
 MAGNA_FP = "/mnt/data/UAF-data/working_a/SALVO/20240611-BEO/magnaprobe/salvo_beo_line_magnaprobe-geodel_20240611.a2.csv"
 EMLID_FP = "/mnt/data/media/photography/SALVO/working_a/20240611-BEO/emlid/reachm2_raw_202406120008_ubx/reachm2_raw_202406120008.pos"
 
+# Local coordinate system
+LOCAL_EPSG = 3338
+
 # Perform GPS comparison analysis, and display figure
 DISPLAY = True
 
@@ -64,6 +68,10 @@ OFFSET = timedelta(hours=0, seconds=-1.7)
 # -1.7 98.2
 # -1.8 97.3
 # -2.0 96.8
+
+# Search radius, in m, to match MagnaProbe point to PPK position when timestamps do not match. The MagnaProbe embedded
+# GPS position, used for the matching, has an error of several meters
+MATCH_RADIUS = 10.0
 # b-grade products are generated in 'working_b' directory
 # output_dir = os.path.dirname(MAGNA_FP)..replace("working_a", "working_b")
 output_dir = os.path.dirname(MAGNA_FP)
@@ -97,21 +105,9 @@ utc_endtime = (
     - timedelta(hours=timezone)
 )
 
-# Load position file
+# Load position file, converted to XYZ, from the cache after the first run
 print("Loading: ", EMLID_FP)
-pos_df = pd.read_csv(EMLID_FP, sep="\\s+", header=9)
-pos_df = pos_df.rename(columns={"%": "date"})
-
-# convert time to UTC if in GPST
-if "GPST" in pos_df.columns:
-    pos_df["UTC"] = pos_df["GPST"] - timedelta(seconds=18)
-    pos_df.drop(["GPST"], inplace=True, axis=1)
-
-# aggregate date and time as a timestamp
-pos_df["Timestamp"] = pd.to_datetime(
-    pos_df["date"] + " " + pos_df["UTC"], format="ISO8601"
-)
-pos_df.drop(["date", "UTC"], inplace=True, axis=1)
+pos_df = read_positions(EMLID_FP, epsg=LOCAL_EPSG)
 
 # For location file
 if "location" in EMLID_FP or not "events" in EMLID_FP:
@@ -120,34 +116,10 @@ if "location" in EMLID_FP or not "events" in EMLID_FP:
     # Sometimes R2 timestamp are off by a few milliseconds, timestamp is rounded to collection frequency
     pos_df["Timestamp"] = pos_df["Timestamp"].apply(lambda x: x.round(pos_freq))
 
-# Rename columns to match magnaprobe
-pos_header_rename = {
-    "latitude(deg)": "Latitude",
-    "longitude(deg)": "Longitude",
-    "height(m)": "Altitude",
-    "Q": "Quality",
-    "ns": "NSatellite",
-    "sdn(m)": "SdN",
-    "sde(m)": "SdE",
-    "sdu(m)": "SdU",
-    "sdne(m)": "SdNE",
-    "sdeu(m)": "SdEU",
-    "sdun(m)": "SdUN",
-    "age(s)": "age",
-    "ratio": "ratio",
-}
-pos_df.rename(columns=pos_header_rename, inplace=True)
-
-# Convert LLH to XYZ
-# Convert lat/lon toward X, Y and Z
-LOCAL_EPSG = 3338
-import pyproj
-
-xform = pyproj.Transformer.from_crs("4326", LOCAL_EPSG)
-pos_df[["X", "Y"]] = pd.DataFrame(
-    xform.transform(pos_df["Latitude"], pos_df["Longitude"])
-).transpose()
-pos_df["Z"] = pos_df["Altitude"]
+# Local ENU coordinates around the site origin recorded in the MagnaProbe configuration by a1_formatting
+pos_df[["E", "N", "U"]] = enu.compute_enu(
+    pos_df, origin=enu.site_origin(config["magna"])
+)
 
 # Compute Distance for emlid data
 if any(pos_df["Z"] < 0):
@@ -184,6 +156,32 @@ pos_df.rename(columns=col_dict, inplace=True)
 # Merge data frame
 out_df = pd.merge(magna_df, pos_df, on="Timestamp", how="left")
 
+# Fallback to spatial matching when timestamps do not match, e.g. when the MagnaProbe clock is off
+if out_df["Quality"].isna().all():
+    print(
+        "No matching timestamp, matching MagnaProbe points to the nearest PPK position"
+    )
+    match_df = matching.spatial_match(
+        magna_df,
+        pos_df,
+        radius=MATCH_RADIUS,
+        query_columns=["X_mg", "Y_mg"],
+        track_columns=["X_m2", "Y_m2"],
+    )
+    out_df = magna_df.join(match_df[["TrackIndex", "MatchDist", "MatchDeltaT"]])
+    n_unmatched = out_df["TrackIndex"].isna().sum()
+    if n_unmatched:
+        print(
+            f"{n_unmatched} MagnaProbe points without PPK position within {MATCH_RADIUS} m, written with nan position"
+        )
+    out_df = pd.merge(
+        out_df,
+        pos_df.drop(columns=["Timestamp"]),
+        left_on="TrackIndex",
+        right_index=True,
+        how="left",
+    )
+
 if DISPLAY:
     print("Performing geospatial differences analysis")
 
@@ -44,6 +44,7 @@ from scipy.stats import linregress
 import yaml
 
 from salvo.analysis import distance
+from salvo.file.cache import read_positions
 
 # Filepath to data
 MAGNA_FP = "/mnt/data/UAF-data/working_a/SALVO/20240530-ICE/magnaprobe/salvo_ice_line_magnaprobe-geodel_20240530.a1.dat"
@@ -53,6 +54,9 @@ EMLID_FP = (
     "/mnt/data/UAF-data/working_a/SALVO/20240608-BEO/emlid/reachm2_raw_202406082214.pos"
 )
 
+# Local coordinate system
+LOCAL_EPSG = 3338
+
 # Perform GPS comparison analysis, and display figure
 DISPLAY = True
 
@@ -92,21 +96,12 @@ utc_endtime = (
     - timedelta(hours=timezone)
 )
 
-# Load ppk position file
+# Load ppk position file within the MagnaProbe survey time window, converted to XYZ with distances from the origin of
+# the file, from the cache after the first run
 print("Loading: ", EMLID_FP)
-pos_df = pd.read_csv(EMLID_FP, sep="\\s+", header=9)
-pos_df = pos_df.rename(columns={"%": "date"})
-
-# convert time to UTC if in GPST
-if "GPST" in pos_df.columns:
-    pos_df["UTC"] = pos_df["GPST"] - timedelta(seconds=18)
-    pos_df.drop(["GPST"], inplace=True, axis=1)
-
-# aggregate date and time as a timestamp
-pos_df["Timestamp"] = pd.to_datetime(
-    pos_df["date"] + " " + pos_df["UTC"], format="ISO8601"
+pos_df = read_positions(
+    EMLID_FP, epsg=LOCAL_EPSG, distance=True, start=utc_starttime, end=utc_endtime
 )
-pos_df.drop(["date", "UTC"], inplace=True, axis=1)
 
 # For location file
 if "location" in EMLID_FP or not "events" in EMLID_FP:
@@ -116,40 +111,6 @@ if "location" in EMLID_FP or not "events" in EMLID_FP:
     pos_df["Timestamp"] = pos_df["Timestamp"].apply(lambda x: x.round(pos_freq))
 
 
-# Rename columns to match magnaprobe
-pos_header_rename = {
-    "latitude(deg)": "Latitude",
-    "longitude(deg)": "Longitude",
-    "height(m)": "Altitude",
-    "Q": "Quality",
-    "ns": "NSatellite",
-    "sdn(m)": "SdN",
-    "sde(m)": "SdE",
-    "sdu(m)": "SdU",
-    "sdne(m)": "SdNE",
-    "sdeu(m)": "SdEU",
-    "sdun(m)": "SdUN",
-    "age(s)": "age",
-    "ratio": "ratio",
-}
-pos_df.rename(columns=pos_header_rename, inplace=True)
-
-# Convert LLH to XYZ
-# Convert lat/lon toward X, Y and Z
-LOCAL_EPSG = 3338
-import pyproj
-
-xform = pyproj.Transformer.from_crs("4326", LOCAL_EPSG)
-pos_df[["X", "Y", "Z'"]] = pd.DataFrame(
-    xform.transform(pos_df["Latitude"], pos_df["Longitude"], pos_df["Altitude"])
-).transpose()
-pos_df["Z"] = pos_df["Altitude"]
-
-pos_df[["TrackDist", "TrackDistCum", "DistOrigin"]] = distance.compute_distance(
-    pos_df[["X", "Y", "Z"]]
-)
-
-
 # Load data file
 print("Loading: ", MAGNA_FP)
 magna_df = pd.read_csv(MAGNA_FP, header=0)
@@ -7,26 +7,45 @@ from magnaprobe_toolbox import analysis
 from magnaprobe_toolbox.io import upper_cal, lower_cal
 from cmcrameri import cm
 
+from salvo.catalog import Catalog
+
 DATA_DIR = "/mnt/data/UAF-data/working_a/SALVO/"
+CATALOG_FP = os.path.join(os.path.expanduser('~'), '.salvo', 'salvo_catalog.sqlite')
 
 LOC = '_line'
+
+# Update the catalog of the working directory, only changed directories are listed
+catalog = Catalog(CATALOG_FP)
+catalog.scan(DATA_DIR)
+
+
+def latest_files(site):
+    """
+    Return the latest a-level magnaprobe product of each survey date for the site
+    :param site: string
+        Site name, e.g. 'ARM'
+    :return fn_dict: dict
+        Dictionary with survey date as key, and [version, filepath] as value
+    """
+    latest_df = catalog.latest(grade='a', survey_site=site.lower(), extension='csv')
+    # Locations starting with LOC, e.g. line and line50cm for '_line'
+    latest_df = latest_df.loc[
+        latest_df['location'].str.startswith(LOC.strip('_'), na=False)
+        & latest_df['path'].str.contains('magnaprobe')
+        & ~latest_df['filename'].str.startswith('.~')
+    ]
+    fn_dict = {}
+    for _, row in latest_df.sort_values('level_number').iterrows():
+        fn_dict[pd.to_datetime(row['survey_date'])] = [row['level_number'], row['path']]
+    return fn_dict
+
+
 stats_site = {}
 all_site = {}
 for SITE in ['ARM', 'BEO', 'ICE']:
-    fn_dict = {}
-    for path, subdirs, files in os.walk(DATA_DIR):
-        if SITE in path and 'magnaprobe' in path:
-            date = path.split('/')[-2].split('-')[0]
-            date = pd.to_datetime(date)
-            for file in files:
-                if file.endswith('.csv') and  LOC in file and '.a' in file and not file.startswith('.~'):
-                    version = int(file.split('.a')[1][:-4])
-                    if date not in fn_dict.keys():
-                        fn_dict[date] = [version, os.path.join(path, file)]
-                    elif version > fn_dict[date][0]:
-                        fn_dict[date] = [version, os.path.join(path, file)]
-            if date in fn_dict:
-                print(date, fn_dict[date][0], fn_dict[date][-1].split('/')[-1])
+    fn_dict = latest_files(SITE)
+    for date in sorted(fn_dict):
+        print(date, fn_dict[date][0], fn_dict[date][-1].split('/')[-1])
 
     # Define figure subplots
     stats_df = pd.DataFrame()
@@ -126,18 +145,7 @@ for SITE in ['ARM', 'BEO', 'ICE']:
 data = []
 # Depletion curve
 for SITE in ['ARM', 'BEO', 'ICE']:
-    fn_dict = {}
-    for path, subdirs, files in os.walk(DATA_DIR):
-        if SITE in path and 'magnaprobe' in path:
-            date = path.split('/')[-2].split('-')[0]
-            date = pd.to_datetime(date)
-            for file in files:
-                if file.endswith('.csv') and  LOC in file and '.a' in file and not file.startswith('.~'):
-                    version = int(file.split('.a')[1][:-4])
-                    if date not in fn_dict.keys():
-                        fn_dict[date] = [version, os.path.join(path, file)]
-                    elif version > fn_dict[date][0]:
-                        fn_dict[date] = [version, os.path.join(path, file)]
+    fn_dict = latest_files(SITE)
 
     # Define figure subplots
     stats_df = pd.DataFrame()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Decompose the position error of the MagnaProbe internal GPS with respect to the PPK position in along-track and
+cross-track components, for all the b0 products of the season at once.
+
+Inputs:
+    DATA_DIR: Directory containing the b0 products, generated by b1b_position_integration.py
+
+Outputs:
+    Comma-separated variable (csv) file with the error statistics by fix quality, for the season and for each survey
+
+@author: Marc Oggier
+University of Alaska, Fairbanks
+"""
+
+import os
+
+import pandas as pd
+
+from salvo.analysis import error
+from salvo.file import walk_files
+
+DATA_DIR = "/mnt/data/UAF-data/working_a/SALVO/"
+
+# Load all b0 products, with the survey filename as survey key
+b0_fps = walk_files(DATA_DIR, pattern="*magnaprobe*.b0.csv", workers=8)
+season_df = pd.concat(
+    [pd.read_csv(fp).assign(Survey=os.path.basename(fp)) for fp in sorted(b0_fps)],
+    ignore_index=True,
+)
+season_df["Timestamp"] = pd.to_datetime(season_df["Timestamp"], format="ISO8601")
+
+# Compute error along and across the PPK walking direction
+error_df = error.position_error(season_df, group="Survey")
+error_df[["Survey", "Quality"]] = season_df[["Survey", "Quality"]]
+
+# Statistics by fix quality for the season, and by survey
+stats_df = error.error_statistics(error_df, by="Quality")
+print(stats_df)
+stats_df.to_csv(os.path.join(DATA_DIR, "salvo_magnaprobe-gps-error.csv"))
+
+survey_stats_df = error.error_statistics(error_df, by=["Survey", "Quality"])
+survey_stats_df.to_csv(os.path.join(DATA_DIR, "salvo_magnaprobe-gps-error_survey.csv"))
@@ -28,12 +28,11 @@ qc_data = mt.analysis.distance.compute(qc_data)
 pos_df = pd.read_csv(POS_FP)
 
 LOCAL_EPSG = 3338
-import pyproj
+from salvo.analysis.projection import transform
 
-xform = pyproj.Transformer.from_crs("4326", LOCAL_EPSG)
-pos_df[["X", "Y"]] = pd.DataFrame(
-    xform.transform(pos_df["Latitude"], pos_df["Longitude"])
-).transpose()
+pos_df["X"], pos_df["Y"] = transform(
+    pos_df["Latitude"], pos_df["Longitude"], target=LOCAL_EPSG
+)
 pos_df["Z"] = pos_df["Elevation"]
 
 
@@ -0,0 +1,182 @@
+"""
+File to compute the location along a transect line (chainage) and the cross-track offset from a reference line
+"""
+import logging
+import os
+
+import numpy as np
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# Reference lines already fitted or loaded, by site transect and number of bins
+_REFERENCE_LINES = {}
+
+
+def _fit_straight_line(xy):
+    """
+    Fit a straight line on the principal axis of the points, from the first to the last point projected on the axis
+    """
+    center = xy.mean(axis=0)
+    # Principal axis of the transect
+    _, _, vh = np.linalg.svd(xy - center, full_matrices=False)
+    axis = vh[0]
+    s = (xy - center) @ axis
+    if s[0] > np.median(s):
+        axis, s = -axis, -s
+    return center + np.outer([s.min(), s.max()], axis)
+
+
+def fit_line(xy, n_bins=1):
+    """
+    Fit a reference polyline through the points of a transect, given in survey order. The polyline starts at the end
+    closest to the first surveyed point.
+    For a straight transect (n_bins=1), the line is fitted on the principal axis of the points, from the first to the
+    last point projected on the axis.
+    For a curved transect, the points are split in n_bins bins of equal length along the track. The polyline goes
+    through the centroid of each bin, and is extended by half a bin at both ends. A straight line is fitted instead
+    if the track has no length or if fewer than two bins contain points.
+    :param xy: 2darray, float
+        Array of shape (N, 2) with the projected coordinates of the transect points
+    :param n_bins: int
+        Number of bins along the track. A straight line is fitted for 1 (default)
+    :return line_xy: 2darray, float
+        Array of shape (2, 2) for a straight line, (n_bins + 2, 2) otherwise, with the vertices of the polyline
+    """
+    xy = np.asarray(xy, dtype=float)
+    xy = xy[~np.isnan(xy).any(axis=1)]
+
+    if n_bins == 1:
+        return _fit_straight_line(xy)
+
+    # Bin the points by cumulative distance along the track
+    s = np.concatenate(([0], np.cumsum(np.hypot(*np.diff(xy, axis=0).T))))
+    if s[-1] == 0:
+        return _fit_straight_line(xy)
+    bins = np.minimum((s / s[-1] * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    if np.count_nonzero(counts) < 2:
+        return _fit_straight_line(xy)
+    centroids = np.stack(
+        [np.bincount(bins, weights=xy[:, ii], minlength=n_bins) for ii in range(2)],
+        axis=1,
+    )
+    centroids = centroids[counts > 0] / counts[counts > 0, np.newaxis]
+    start = centroids[0] - (centroids[1] - centroids[0]) / 2
+    end = centroids[-1] + (centroids[-1] - centroids[-2]) / 2
+    return np.vstack((start, centroids, end))
+
+
+def project(xy, line_xy):
+    """
+    Project points onto a reference polyline, in a single vectorized pass over all points and segments.
+    :param xy: 2darray, float
+        Array of shape (N, 2) with the projected coordinates of the points
+    :param line_xy: 2darray, float
+        Array of shape (M, 2) with the vertices of the reference polyline
+    :return along, cross: 1darray, 1darray
+        Distance along the polyline from its first vertex (chainage) and signed cross-track offset, positive on the
+        left of the line, in m. Points with missing coordinates are returned as nan.
+    """
+    xy = np.asarray(xy, dtype=float)
+    line_xy = np.asarray(line_xy, dtype=float)
+
+    seg_a = line_xy[:-1]
+    seg_v = np.diff(line_xy, axis=0)
+    seg_len = np.hypot(seg_v[:, 0], seg_v[:, 1])
+    seg_start = np.concatenate(([0], np.cumsum(seg_len)[:-1]))
+
+    # Parametric position of the projection of every point on every segment, shape (N, M-1)
+    d = xy[:, np.newaxis, :] - seg_a[np.newaxis, :, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.clip(np.sum(d * seg_v, axis=2) / seg_len**2, 0, 1)
+    t = np.nan_to_num(t)
+    residual = d - t[:, :, np.newaxis] * seg_v
+    dist2 = np.sum(residual**2, axis=2)
+
+    nearest = np.argmin(np.nan_to_num(dist2, nan=np.inf), axis=1)
+    rows = np.arange(len(xy))
+    along = seg_start[nearest] + t[rows, nearest] * seg_len[nearest]
+    cross = np.sqrt(dist2[rows, nearest])
+    # Sign of the cross-track offset from the cross product of the segment direction and the point
+    side = np.sign(
+        seg_v[nearest, 0] * d[rows, nearest, 1]
+        - seg_v[nearest, 1] * d[rows, nearest, 0]
+    )
+    cross = np.where(side < 0, -cross, cross)
+
+    missing = np.isnan(xy).any(axis=1)
+    along[missing] = np.nan
+    cross[missing] = np.nan
+    return along, cross
+
+
+def reference_line(name, xy=None, n_bins=1, cache_fp=None):
+    """
+    Return the reference polyline of a site transect. The polyline is fitted once from xy, and cached in memory and in
+    the yaml file cache_fp, if given, for later surveys of the same transect. Polylines are cached by transect name and
+    number of bins, under lines[name][n_bins] in the yaml file.
+    :param name: string
+        Name of the site transect, e.g. 'arm_longline'
+    :param xy: 2darray, float or None (default)
+        Array of shape (N, 2) with the projected coordinates of the transect points, used if the reference polyline
+        is not cached yet
+    :param n_bins: int
+        Number of bins along the track used to fit the polyline, see fit_line
+    :param cache_fp: string or None (default)
+        Path to the yaml file storing the reference polylines
+    :return line_xy: 2darray, float
+        Array of shape (M, 2) with the vertices of the reference polyline
+    """
+    if (name, n_bins) in _REFERENCE_LINES:
+        return _REFERENCE_LINES[(name, n_bins)]
+
+    lines = {}
+    if cache_fp is not None and os.path.exists(cache_fp):
+        with open(cache_fp, "r", encoding="utf-8") as f:
+            lines = yaml.safe_load(f) or {}
+    if not isinstance(lines.get(name), dict):
+        lines[name] = {}
+    if n_bins in lines[name]:
+        line_xy = np.array(lines[name][n_bins], dtype=float)
+    elif xy is not None:
+        logger.info(str("Fitting reference line for " + name))
+        line_xy = fit_line(xy, n_bins=n_bins)
+        if cache_fp is not None:
+            lines[name][n_bins] = line_xy.tolist()
+            with open(cache_fp, "w", encoding="utf-8") as f:
+                yaml.dump(lines, f)
+    else:
+        raise ValueError(str("No reference line available for " + name))
+
+    _REFERENCE_LINES[(name, n_bins)] = line_xy
+    return line_xy
+
+
+def compute_chainage(input_df, name=None, line_xy=None, n_bins=1, cache_fp=None):
+    """
+    Compute the location along the transect (LineLocation) and the cross-track offset (LineOffset) of each point.
+    :param input_df: pd.DataFrame()
+        Dataframe containing columns X and Y
+    :param name: string or None (default)
+        Name of the site transect, used to retrieve the cached reference polyline, or to cache the fitted one
+    :param line_xy: 2darray, float or None (default)
+        Vertices of the reference polyline. If None, the reference polyline is retrieved or fitted with reference_line
+    :param n_bins: int
+        Number of bins along the track used to fit the polyline, see fit_line
+    :param cache_fp: string or None (default)
+        Path to the yaml file storing the reference polylines
+    :return: pd.DataFrame()
+        Dataframe with columns LineLocation and LineOffset, sharing the index of input_df
+    """
+    xy = input_df[["X", "Y"]].to_numpy(dtype=float)
+    if line_xy is None:
+        if name is None:
+            line_xy = fit_line(xy, n_bins=n_bins)
+        else:
+            line_xy = reference_line(name, xy, n_bins=n_bins, cache_fp=cache_fp)
+    along, cross = project(xy, line_xy)
+    output_df = input_df[[]].copy()
+    output_df["LineLocation"] = along
+    output_df["LineOffset"] = cross
+    return output_df
@@ -0,0 +1,176 @@
+"""
+Debounce filter for event triggers.
+
+The mechanical switch triggering emlid events bounces, which records several events within a fraction of a second
+for a single measurement. Triggers are grouped in bursts: a new burst starts when the time since the previous trigger
+exceeds the dead time, like the discharge of an RC filter. A single trigger is kept per burst, either the first one or
+the one with the best position quality.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEAD_TIME = pd.Timedelta("0.1s")
+POLICIES = ["first", "best"]
+
+
+def burst_id(timestamps, dead_time=DEAD_TIME):
+    """
+    Return the burst number of each trigger
+    :param timestamps: array_like
+        Time-sorted trigger times, as datetime64 or int64 nanoseconds
+    :param dead_time: timedelta-like
+        Triggers closer than dead_time to the previous trigger belong to the same burst
+    :return burst: 1darray, int64
+        Burst number of each trigger, starting at 0
+    """
+    timestamps = np.asarray(timestamps)
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        timestamps = timestamps.astype("datetime64[ns]").view(np.int64)
+    starts = np.empty(len(timestamps), dtype=bool)
+    starts[:1] = True
+    np.greater(np.diff(timestamps), pd.Timedelta(dead_time).value, out=starts[1:])
+    return np.cumsum(starts) - 1
+
+
+def debounce_mask(timestamps, dead_time=DEAD_TIME, quality=None, policy="first"):
+    """
+    Return the triggers to keep, one per burst, in a single vectorized pass
+    :param timestamps: array_like
+        Time-sorted trigger times, as datetime64 or int64 nanoseconds
+    :param dead_time: timedelta-like
+        Triggers closer than dead_time to the previous trigger belong to the same burst
+    :param quality: array_like, optional
+        Quality of each trigger, the lower the better (1: fix, 2: float, 5: single). Required by the 'best' policy
+    :param policy: 'first' or 'best'
+        Keep the first trigger of each burst, or the one with the best quality, the first one in case of tie
+    :return keep: 1darray, bool
+    """
+    if policy not in POLICIES:
+        raise ValueError(str("Debounce policy must be one of " + ", ".join(POLICIES)))
+    burst = burst_id(timestamps, dead_time)
+    keep = np.zeros(len(burst), dtype=bool)
+    if policy == "first" or quality is None:
+        keep[:1] = True
+        keep[1:] = burst[1:] != burst[:-1]
+        return keep
+    # Sort by burst, then quality, then time: the first row of each burst is the best trigger
+    order = np.lexsort((np.arange(len(burst)), np.asarray(quality), burst))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = burst[order][1:] != burst[order][:-1]
+    keep[order[first]] = True
+    return keep
+
+
+def debounce(
+    event_df,
+    dead_time=DEAD_TIME,
+    policy="first",
+    time_column="Timestamp",
+    quality_column="Quality",
+):
+    """
+    Remove the bouncing triggers of an event dataframe
+    :param event_df: pd.DataFrame()
+        Time-sorted event dataframe
+    :param dead_time: timedelta-like
+        Triggers closer than dead_time to the previous trigger belong to the same burst
+    :param policy: 'first' or 'best'
+        See debounce_mask
+    :param time_column: string
+        Name of the time column
+    :param quality_column: string
+        Name of the quality column, used by the 'best' policy
+    :return event_df: pd.DataFrame()
+        Filtered event dataframe, with one trigger per burst
+    """
+    quality = event_df[quality_column].to_numpy() if policy == "best" else None
+    keep = debounce_mask(
+        event_df[time_column].to_numpy(), dead_time, quality=quality, policy=policy
+    )
+    return event_df.loc[keep]
+
+
+class Debouncer:
+    """
+    Streaming debounce filter over chunks of an event file. The last burst of each chunk may continue in the next
+    chunk: its triggers are held back until the burst is closed.
+
+    Example:
+        debouncer = Debouncer(dead_time="0.1s", policy="best")
+        for chunk in iter_pos(event_fp):
+            write(debouncer.filter(chunk))
+        write(debouncer.flush())
+    """
+
+    def __init__(
+        self,
+        dead_time=DEAD_TIME,
+        policy="first",
+        time_column="Timestamp",
+        quality_column="Quality",
+    ):
+        """
+        :param dead_time: timedelta-like
+            Triggers closer than dead_time to the previous trigger belong to the same burst
+        :param policy: 'first' or 'best'
+            See debounce_mask
+        :param time_column: string
+            Name of the time column
+        :param quality_column: string
+            Name of the quality column, used by the 'best' policy
+        """
+        self.dead_time = pd.Timedelta(dead_time)
+        self.policy = policy
+        self.time_column = time_column
+        self.quality_column = quality_column
+        self.n_triggers = 0
+        self.n_dropped = 0
+        self._pending = None
+
+    def _filter(self, event_df):
+        """
+        Keep one trigger per burst of closed bursts
+        """
+        return debounce(
+            event_df,
+            self.dead_time,
+            policy=self.policy,
+            time_column=self.time_column,
+            quality_column=self.quality_column,
+        )
+
+    def filter(self, chunk):
+        """
+        Filter a chunk of triggers
+        :param chunk: pd.DataFrame()
+            Next time-sorted chunk of the event file
+        :return event_df: pd.DataFrame()
+            Kept triggers of the bursts closed by this chunk
+        """
+        self.n_triggers += len(chunk)
+        if self._pending is not None:
+            chunk = pd.concat([self._pending, chunk], ignore_index=True)
+        burst = burst_id(chunk[self.time_column].to_numpy(), self.dead_time)
+        # Hold back the last burst, which may continue in the next chunk
+        closed = burst < burst[-1] if len(burst) else np.zeros(0, dtype=bool)
+        self._pending = chunk.loc[~closed]
+        event_df = self._filter(chunk.loc[closed])
+        self.n_dropped += int(closed.sum()) - len(event_df)
+        return event_df
+
+    def flush(self):
+        """
+        Filter the triggers held back, at the end of the event file
+        :return event_df: pd.DataFrame()
+            Kept trigger of the last burst
+        """
+        if self._pending is None:
+            return pd.DataFrame()
+        event_df = self._filter(self._pending)
+        self.n_dropped += len(self._pending) - len(event_df)
+        self._pending = None
+        return event_df
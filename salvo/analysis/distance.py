@@ -3,6 +3,7 @@ File to compute euclidian distance
 """
 import logging
 import numpy as np
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
@@ -41,47 +42,206 @@ def euclidian_distance(p1, p2):
     return d
 
 
-def compute_distance(input_df, origin_pt=None):
+def _origin_point(origin_pt, n_dim):
+    """
+    Format the origin point to the dimension of the coordinate array
+    :param origin_pt: 1darray, float or None
+        Origin point of format [x0, y0, z0] or [x0, y0], or a scalar. Missing dimension are filled with 0.
+    :param n_dim: int
+        Number of dimension of the coordinate array
+    :return origin_pt: 1darray or None
+        Origin point of dimension n_dim
+    """
+    if origin_pt is None:
+        return None
+    if isinstance(origin_pt, (int, float)):
+        return np.full(n_dim, float(origin_pt))
+    origin_pt = np.asarray(origin_pt, dtype=float).ravel()
+    if len(origin_pt) < n_dim:
+        logger.warning("Setting extra dimension are filled with 0")
+        origin_pt = np.concatenate((origin_pt, np.zeros(n_dim - len(origin_pt))))
+    elif len(origin_pt) > n_dim:
+        raise ValueError("Origin point has more dimension than the coordinate data")
+    return origin_pt
+
+
+def track_distance(xyz, origin_pt=None, segments=None):
+    """
+    Compute distance in between point (TrackDist), cumulative distance in between point (TrackDistCum) and distance
+    from origin point (DistOrigin) for an array of coordinates.
+    Rows with missing coordinates (nan) are skipped: the next valid point is measured from the last known coordinate,
+    and the missing rows are returned as nan.
+    :param xyz: 2darray, float
+        Array of shape (N, D) containing the coordinates of N points in D dimension
+    :param origin_pt: 1darray or None (default)
+        If none, origin point is the first valid point of the array, respectively of each segment
+    :param segments: 1darray or None (default)
+        Array of length N containing a segment key (e.g. survey name) for each point. TrackDistCum and DistOrigin are
+        reset at the first valid point of each segment. Rows of a segment do not need to be contiguous, their order
+        within the segment is conserved.
+    :return track_dist, track_dist_cum, dist_origin: 1darray, 1darray, 1darray
+        Arrays of length N
+    """
+    xyz = np.ascontiguousarray(xyz, dtype=float)
+    if xyz.ndim == 1:
+        xyz = xyz[:, np.newaxis]
+    n_pts, n_dim = xyz.shape
+
+    track_dist = np.full(n_pts, np.nan)
+    track_dist_cum = np.full(n_pts, np.nan)
+    dist_origin = np.full(n_pts, np.nan)
+
+    idx = np.flatnonzero(~np.isnan(xyz).any(axis=1))
+    if len(idx) == 0:
+        return track_dist, track_dist_cum, dist_origin
+
+    # Flag the first valid point of each segment
+    seg_start = np.zeros(len(idx), dtype=bool)
+    seg_start[0] = True
+    if segments is not None:
+        _, codes = np.unique(np.asarray(segments), return_inverse=True)
+        codes = codes.ravel()[idx]
+        if np.any(codes[1:] < codes[:-1]):
+            order = np.argsort(codes, kind="stable")
+            idx, codes = idx[order], codes[order]
+        seg_start[1:] = codes[1:] != codes[:-1]
+    # Position of the first point of the segment, for each point
+    seg_first = np.flatnonzero(seg_start)[np.cumsum(seg_start) - 1]
+    xyz_v = xyz[idx]
+
+    # Distance to the previous valid point, i.e. last known coordinate
+    dist = np.zeros(len(idx))
+    dist[1:] = np.sqrt(np.sum(np.diff(xyz_v, axis=0) ** 2, axis=1))
+    dist[seg_start] = 0
+    dist_cum = np.cumsum(dist)
+
+    origin_pt = _origin_point(origin_pt, n_dim)
+    if origin_pt is None:
+        origin_pt = xyz_v[seg_first]
+
+    track_dist[idx] = dist
+    track_dist_cum[idx] = dist_cum - dist_cum[seg_first]
+    dist_origin[idx] = np.sqrt(np.sum((xyz_v - origin_pt) ** 2, axis=1))
+    return track_dist, track_dist_cum, dist_origin
+
+
+def compute_distance(input_df, origin_pt=None, group=None):
     """
     Compute distance in between point (TrackDist), cumulative distance in between point (TrackDistCum) and distance from
-    origin point (DistOrigin). The origin point is the first point of the dataframe, unless
-    :param df: pd.DataFrame()
+    origin point (DistOrigin). The origin point is the first valid point of the dataframe, unless specified.
+    If a point is missing, the distance to the next point is computed from the last known coordinate.
+    If group is given, distances are computed for all the surveys at once, resetting TrackDistCum and DistOrigin for
+    each survey.
+    :param input_df: pd.DataFrame()
             Dataframe containing the raw data. Dataframe should contain columns X, Y and Z. The latter could be set
             to 0 if not needed.
     :param origin_pt: 1darray or None (default)
         If none, origin point is the first point in the dataframe
         Origin point should be either of format [x0, y0, z0] or [x0, y0]. In the latter case, z0 is set to zero (z0=0).
-    :return:
+    :param group: string, array_like or None (default)
+        Survey key of each point. Either the name of a column of input_df, which is then not used as coordinate, or an
+        array of the same length as input_df.
+    :return: pd.DataFrame()
+        Dataframe with columns TrackDist, TrackDistCum and DistOrigin, sharing the index of input_df
     """
-    data_df = input_df.copy().reset_index(drop=True)
-    if origin_pt is None:
-        origin_pt = np.array(
-            [data_df.iloc[0, ii_col] for ii_col, _ in enumerate(input_df.columns)]
-        )
-    elif isinstance(origin_pt, (int, float)):
-        origin_pt = np.array([origin_pt]) * len(data_df.columns)
-    elif len(origin_pt) < len(data_df.columns):
-        logger.warning("Setting extra dimension are filled with 0")
-        origin_pt = np.array(origin_pt)
-        origin_pt = np.concatenate(
-            (origin_pt, np.zeros(len(data_df.columns) - len(origin_pt)))
-        )
+    if isinstance(group, str):
+        segments = input_df[group].to_numpy()
+        input_df = input_df.drop(columns=group)
+    elif group is not None:
+        segments = np.asarray(group)
     else:
-        logger.error("TODO: compute_distance not defined")
+        segments = None
+    track_dist, track_dist_cum, dist_origin = track_distance(
+        input_df.to_numpy(dtype=float), origin_pt=origin_pt, segments=segments
+    )
+    return pd.DataFrame(
+        {
+            "TrackDist": track_dist,
+            "TrackDistCum": track_dist_cum,
+            "DistOrigin": dist_origin,
+        },
+        index=input_df.index,
+    )
 
-    col_h = list(data_df.columns)
-    col_s = [col + "_s" for col in data_df.columns]
 
-    data_df.loc[:, col_s] = data_df[col_h].shift().to_numpy()
-    data_df.loc[0, col_s] = data_df.loc[0, col_h].to_numpy()
+class DistanceAccumulator:
+    """
+    Compute TrackDist, TrackDistCum and DistOrigin chunk by chunk, for position logs too large to be loaded at once.
+    The last known coordinate, the running cumulative distance and the origin point are carried over from one chunk to
+    the next, so that the concatenated results are identical to compute_distance on the full data.
 
-    # TODO: if previous point is missing, compute with the last known coordinate, aka filter nas row out
-    data_df["TrackDist"] = data_df.apply(
-        lambda x: euclidian_distance(x[col_h], x[col_s]), axis=1
-    )
-    data_df["TrackDistCum"] = data_df["TrackDist"].cumsum()
-    data_df["DistOrigin"] = data_df.apply(
-        lambda x: euclidian_distance(x[col_h], origin_pt), axis=1
-    )
-    data_df.drop(col_s, axis=1, inplace=True)
-    return data_df[["TrackDist", "TrackDistCum", "DistOrigin"]]
+    Example:
+        accumulator = DistanceAccumulator()
+        for chunk in pd.read_csv(pos_fp, chunksize=100000):
+            dist_df = accumulator.update(chunk[["X", "Y", "Z"]])
+    """
+
+    def __init__(self, origin_pt=None):
+        """
+        :param origin_pt: 1darray or None (default)
+            If none, origin point is the first valid point of the first chunk
+        """
+        self.origin_pt = origin_pt
+        self.last_pt = None
+        self.track_dist_cum = 0.0
+        self.n_points = 0
+
+    def reset(self, origin_pt=None):
+        """
+        Reset the accumulator to start a new track
+        :param origin_pt: 1darray or None (default)
+            If none, origin point is the first valid point of the next chunk
+        """
+        self.origin_pt = origin_pt
+        self.last_pt = None
+        self.track_dist_cum = 0.0
+        self.n_points = 0
+
+    def update(self, chunk):
+        """
+        Compute distance for the next chunk of coordinates
+        :param chunk: pd.DataFrame() or 2darray
+            Coordinates of shape (N, D) of the next chunk, with the same columns for every chunk
+        :return: pd.DataFrame() or (1darray, 1darray, 1darray)
+            Dataframe with columns TrackDist, TrackDistCum and DistOrigin sharing the index of chunk if chunk is a
+            dataframe, otherwise arrays TrackDist, TrackDistCum and DistOrigin of length N
+        """
+        xyz = np.asarray(chunk, dtype=float)
+        if xyz.ndim == 1:
+            xyz = xyz[:, np.newaxis]
+        valid = ~np.isnan(xyz).any(axis=1)
+
+        if self.origin_pt is None and valid.any():
+            self.origin_pt = xyz[valid][0]
+        elif self.origin_pt is not None:
+            self.origin_pt = _origin_point(self.origin_pt, xyz.shape[1])
+
+        # Prepend the last known coordinate of the previous chunk
+        if self.last_pt is not None:
+            xyz = np.vstack((self.last_pt, xyz))
+        track_dist, track_dist_cum, dist_origin = track_distance(
+            xyz, origin_pt=self.origin_pt
+        )
+        if self.last_pt is not None:
+            track_dist = track_dist[1:]
+            track_dist_cum = track_dist_cum[1:]
+            dist_origin = dist_origin[1:]
+            xyz = xyz[1:]
+        track_dist_cum += self.track_dist_cum
+
+        if valid.any():
+            last = np.flatnonzero(valid)[-1]
+            self.last_pt = xyz[last]
+            self.track_dist_cum = track_dist_cum[last]
+        self.n_points += len(xyz)
+
+        if isinstance(chunk, pd.DataFrame):
+            return pd.DataFrame(
+                {
+                    "TrackDist": track_dist,
+                    "TrackDistCum": track_dist_cum,
+                    "DistOrigin": dist_origin,
+                },
+                index=chunk.index,
+            )
+        return track_dist, track_dist_cum, dist_origin
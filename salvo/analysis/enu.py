@@ -0,0 +1,249 @@
+"""
+File to convert geographic coordinates to a local East-North-Up (ENU) frame around a site origin
+
+All functions work on arrays and convert all the points in one call. Latitude and longitude are in decimal degrees,
+height above the WGS84 ellipsoid, ECEF and ENU coordinates in m.
+
+The origin of each site is stored in a site yaml file, shared by all the surveys of the site, so that the ENU
+coordinates of different visits are comparable:
+    arm:
+      origin: {latitude: 71.32, longitude: -156.61, altitude: 10.0}
+The origin is copied to the 'origin' entry of the yaml configuration of each survey.
+"""
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from salvo.analysis.geodesic import WGS84_A, WGS84_B, WGS84_E2
+
+logger = logging.getLogger(__name__)
+
+# Keys of the origin entry in the yaml files
+ORIGIN_KEYS = ["latitude", "longitude", "altitude"]
+
+
+def llh_to_ecef(lat, lon, h):
+    """
+    Convert geographic coordinates to Earth-Centered Earth-Fixed (ECEF) coordinates
+    :param lat: array_like, float
+        Latitude, in decimal degrees
+    :param lon: array_like, float
+        Longitude, in decimal degrees
+    :param h: array_like, float
+        Height above the WGS84 ellipsoid, in m
+    :return xyz: ndarray
+        Array of shape (..., 3) with the ECEF coordinates X, Y, Z in m
+    """
+    phi = np.radians(np.asarray(lat, dtype=float))
+    lam = np.radians(np.asarray(lon, dtype=float))
+    h = np.asarray(h, dtype=float)
+    sin_phi = np.sin(phi)
+    r_n = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_phi**2)
+    x = (r_n + h) * np.cos(phi) * np.cos(lam)
+    y = (r_n + h) * np.cos(phi) * np.sin(lam)
+    z = (r_n * (1 - WGS84_E2) + h) * sin_phi
+    return np.stack(np.broadcast_arrays(x, y, z), axis=-1)
+
+
+def ecef_to_llh(xyz, max_iter=10, tol=1e-12):
+    """
+    Convert Earth-Centered Earth-Fixed (ECEF) coordinates to geographic coordinates. Latitude is solved iteratively,
+    starting from Bowring's approximation, on the full array.
+    :param xyz: array_like, float
+        Array of shape (..., 3) with the ECEF coordinates X, Y, Z in m
+    :param max_iter: int
+        Maximal number of iteration
+    :param tol: float
+        Convergence threshold on the latitude, in radians
+    :return lat, lon, h: ndarray, ndarray, ndarray
+        Latitude and longitude in decimal degrees, and height above the WGS84 ellipsoid in m
+    """
+    xyz = np.asarray(xyz, dtype=float)
+    x, y, z = xyz[..., 0], xyz[..., 1], xyz[..., 2]
+    p = np.hypot(x, y)
+    lam = np.arctan2(y, x)
+
+    # Bowring's initial guess
+    ep2 = (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+    theta = np.arctan2(z * WGS84_A, p * WGS84_B)
+    phi = np.arctan2(
+        z + ep2 * WGS84_B * np.sin(theta) ** 3,
+        p - WGS84_E2 * WGS84_A * np.cos(theta) ** 3,
+    )
+    for _ in range(max_iter):
+        r_n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(phi) ** 2)
+        h = np.where(
+            np.abs(np.cos(phi)) > 1e-10,
+            p / np.cos(phi) - r_n,
+            np.abs(z) - r_n * (1 - WGS84_E2),
+        )
+        phi_prev = phi
+        phi = np.arctan2(z, p * (1 - WGS84_E2 * r_n / (r_n + h)))
+        if np.nanmax(np.abs(phi - phi_prev), initial=0) < tol:
+            break
+    r_n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(phi) ** 2)
+    h = np.where(
+        np.abs(np.cos(phi)) > 1e-10,
+        p / np.cos(phi) - r_n,
+        np.abs(z) - r_n * (1 - WGS84_E2),
+    )
+    return np.degrees(phi), np.degrees(lam), h
+
+
+def _rotation(lat0, lon0):
+    """
+    Return the rotation matrix from ECEF to ENU at the origin point
+    """
+    phi, lam = np.radians(lat0), np.radians(lon0)
+    sin_phi, cos_phi = np.sin(phi), np.cos(phi)
+    sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+    return np.array(
+        [
+            [-sin_lam, cos_lam, 0],
+            [-sin_phi * cos_lam, -sin_phi * sin_lam, cos_phi],
+            [cos_phi * cos_lam, cos_phi * sin_lam, sin_phi],
+        ]
+    )
+
+
+def ecef_to_enu(xyz, origin):
+    """
+    Convert Earth-Centered Earth-Fixed (ECEF) coordinates to the local ENU frame of the origin point
+    :param xyz: array_like, float
+        Array of shape (..., 3) with the ECEF coordinates X, Y, Z in m
+    :param origin: array_like, float
+        Origin point [lat0, lon0, h0], in decimal degrees and m
+    :return enu: ndarray
+        Array of shape (..., 3) with the coordinates E, N, U in m
+    """
+    lat0, lon0, h0 = origin
+    xyz0 = llh_to_ecef(lat0, lon0, h0)
+    return (np.asarray(xyz, dtype=float) - xyz0) @ _rotation(lat0, lon0).T
+
+
+def enu_to_ecef(enu, origin):
+    """
+    Convert coordinates in the local ENU frame of the origin point to Earth-Centered Earth-Fixed (ECEF) coordinates
+    :param enu: array_like, float
+        Array of shape (..., 3) with the coordinates E, N, U in m
+    :param origin: array_like, float
+        Origin point [lat0, lon0, h0], in decimal degrees and m
+    :return xyz: ndarray
+        Array of shape (..., 3) with the ECEF coordinates X, Y, Z in m
+    """
+    lat0, lon0, h0 = origin
+    xyz0 = llh_to_ecef(lat0, lon0, h0)
+    return np.asarray(enu, dtype=float) @ _rotation(lat0, lon0) + xyz0
+
+
+def llh_to_enu(lat, lon, h, origin):
+    """
+    Convert geographic coordinates to the local ENU frame of the origin point
+    :param lat: array_like, float
+        Latitude, in decimal degrees
+    :param lon: array_like, float
+        Longitude, in decimal degrees
+    :param h: array_like, float
+        Height above the WGS84 ellipsoid, in m
+    :param origin: array_like, float
+        Origin point [lat0, lon0, h0], in decimal degrees and m
+    :return enu: ndarray
+        Array of shape (..., 3) with the coordinates E, N, U in m
+    """
+    return ecef_to_enu(llh_to_ecef(lat, lon, h), origin)
+
+
+def enu_to_llh(enu, origin):
+    """
+    Convert coordinates in the local ENU frame of the origin point to geographic coordinates
+    :param enu: array_like, float
+        Array of shape (..., 3) with the coordinates E, N, U in m
+    :param origin: array_like, float
+        Origin point [lat0, lon0, h0], in decimal degrees and m
+    :return lat, lon, h: ndarray, ndarray, ndarray
+        Latitude and longitude in decimal degrees, and height above the WGS84 ellipsoid in m
+    """
+    return ecef_to_llh(enu_to_ecef(enu, origin))
+
+
+def site_origin(config):
+    """
+    Return the site origin from a yaml configuration, defined under the key 'origin' as a dictionary with keys
+    latitude, longitude and altitude. Altitude is set to 0 if not given.
+    :param config: dict
+        Configuration loaded from a yaml configuration file
+    :return origin: 1darray or None
+        Origin point [lat0, lon0, h0], None if the origin is not defined
+    """
+    origin = config.get("origin", None)
+    if origin is None:
+        logger.warning("No site origin defined in the configuration file")
+        return None
+    return np.array(
+        [origin["latitude"], origin["longitude"], origin.get("altitude", 0)],
+        dtype=float,
+    )
+
+
+def reference_origin(site, llh=None, site_fp=None):
+    """
+    Return the origin of a site from the site yaml file. If the site has no origin yet, the first valid point of llh
+    is used and recorded in the site yaml file, for later surveys of the same site.
+    :param site: string
+        Site name, e.g. 'arm'
+    :param llh: 2darray, float or None (default)
+        Array of shape (N, 3) with the latitude, longitude and altitude of the survey points, used if the site has no
+        origin yet
+    :param site_fp: string or None (default)
+        Path to the site yaml file
+    :return origin: 1darray or None
+        Origin point [lat0, lon0, h0], None if the origin is not defined and llh not given
+    """
+    sites = {}
+    if site_fp is not None and os.path.exists(site_fp):
+        with open(site_fp, "r", encoding="utf-8") as f:
+            sites = yaml.safe_load(f) or {}
+    origin = site_origin(sites.get(site, {}))
+    if origin is not None or llh is None:
+        return origin
+
+    llh = np.asarray(llh, dtype=float)
+    origin = llh[~np.isnan(llh).any(axis=1)][0]
+    logger.warning(str("New origin for site " + site + " from the first valid point"))
+    if site_fp is not None:
+        sites.setdefault(site, {})["origin"] = origin_entry(origin)
+        with open(site_fp, "w", encoding="utf-8") as f:
+            yaml.dump(sites, f)
+    return origin
+
+
+def origin_entry(origin):
+    """
+    Return the origin point as the 'origin' entry of a yaml file
+    :param origin: array_like, float
+        Origin point [lat0, lon0, h0]
+    :return: dict
+    """
+    return dict(zip(ORIGIN_KEYS, [float(value) for value in origin]))
+
+
+def compute_enu(input_df, origin=None):
+    """
+    Compute coordinates E, N and U in the local frame of the origin point, for example as input of compute_distance
+    :param input_df: pd.DataFrame()
+        Dataframe containing columns Latitude, Longitude and Altitude (height above the WGS84 ellipsoid)
+    :param origin: array_like, float or None (default)
+        Origin point [lat0, lon0, h0], e.g. from site_origin. If None, the origin falls back to the first valid point
+        of the dataframe, and the ENU coordinates are not comparable with the ones of other surveys
+    :return: pd.DataFrame()
+        Dataframe with columns E, N and U, sharing the index of input_df
+    """
+    llh = input_df[["Latitude", "Longitude", "Altitude"]].to_numpy(dtype=float)
+    if origin is None:
+        logger.warning("No site origin given, using the first valid point as origin")
+        origin = llh[~np.isnan(llh).any(axis=1)][0]
+    enu = llh_to_enu(llh[:, 0], llh[:, 1], llh[:, 2], origin)
+    return pd.DataFrame(enu, columns=["E", "N", "U"], index=input_df.index)
@@ -0,0 +1,128 @@
+"""
+File to decompose the position error of a survey in along-track and cross-track component, with respect to a reference
+track (e.g. MagnaProbe internal GPS with respect to PPK position)
+"""
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def track_motion(xy, time=None, segments=None):
+    """
+    Compute bearing and speed along a track with central differences. The first and last point of each segment use
+    forward, respectively backward differences.
+    :param xy: 2darray, float
+        Array of shape (N, 2) with the projected coordinates of the track, in survey order
+    :param time: 1darray, datetime64 or None (default)
+        Timestamp of each point. If None, speed is not computed
+    :param segments: 1darray or None (default)
+        Segment key (e.g. survey name) of each point. Rows of a segment must be contiguous
+    :return bearing, speed: 1darray, 1darray
+        Bearing in degree, clockwise from the grid north, and speed in m/s. speed is None if time is None
+    """
+    xy = np.asarray(xy, dtype=float)
+    n_pts = len(xy)
+    prev_idx = np.arange(n_pts) - 1
+    next_idx = np.arange(n_pts) + 1
+    seg_start = np.zeros(n_pts, dtype=bool)
+    seg_start[0] = True
+    if segments is not None:
+        segments = np.asarray(segments)
+        seg_start[1:] = segments[1:] != segments[:-1]
+    seg_end = np.roll(seg_start, -1)
+    seg_end[-1] = True
+    prev_idx[seg_start] = np.flatnonzero(seg_start)
+    next_idx[seg_end] = np.flatnonzero(seg_end)
+
+    dxy = xy[next_idx] - xy[prev_idx]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bearing = np.degrees(np.arctan2(dxy[:, 0], dxy[:, 1])) % 360
+        bearing[(dxy == 0).all(axis=1)] = np.nan
+        if time is None:
+            return bearing, None
+        time = np.asarray(time, dtype="datetime64[ns]")
+        dt = (time[next_idx] - time[prev_idx]) / np.timedelta64(1, "s")
+        speed = np.hypot(dxy[:, 0], dxy[:, 1]) / dt
+    speed[dt == 0] = np.nan
+    return bearing, speed
+
+
+def position_error(
+    input_df,
+    test_columns=("X_mg", "Y_mg"),
+    ref_columns=("X_m2", "Y_m2"),
+    time_column="Timestamp",
+    group=None,
+):
+    """
+    Decompose the position error of a survey with respect to the reference track in along-track and cross-track
+    components. The walking direction is given by the bearing of the reference track.
+    :param input_df: pd.DataFrame()
+        Merged dataframe, e.g. b0 product, containing the tested and reference coordinates, in survey order. If the
+        dataframe contains a Bearing column, it is used as walking direction.
+    :param test_columns: list of string
+        Name of the X and Y columns of the tested position
+    :param ref_columns: list of string
+        Name of the X and Y columns of the reference position
+    :param time_column: string or None
+        Name of the timestamp column. If None or missing, Speed is not computed
+    :param group: string or None (default)
+        Name of the column containing the survey key, when several surveys are concatenated
+    :return: pd.DataFrame()
+        Dataframe sharing the index of input_df, with columns:
+        Bearing: bearing of the reference track, in degree clockwise from grid north
+        Speed: speed along the reference track, in m/s
+        ErrorAlong: error along the walking direction, positive forward, in m
+        ErrorCross: error across the walking direction, positive on the right, in m
+        ErrorH: horizontal error, in m
+    """
+    ref_xy = input_df[list(ref_columns)].to_numpy(dtype=float)
+    test_xy = input_df[list(test_columns)].to_numpy(dtype=float)
+    segments = None if group is None else input_df[group].to_numpy()
+    if time_column in input_df.columns:
+        time = input_df[time_column].to_numpy()
+    else:
+        time = None
+
+    bearing, speed = track_motion(ref_xy, time=time, segments=segments)
+    if "Bearing" in input_df.columns:
+        bearing = input_df["Bearing"].to_numpy(dtype=float)
+
+    error = test_xy - ref_xy
+    b_rad = np.radians(bearing)
+    sin_b, cos_b = np.sin(b_rad), np.cos(b_rad)
+
+    output_df = pd.DataFrame(
+        {
+            "Bearing": bearing,
+            "Speed": speed if speed is not None else np.nan,
+            "ErrorAlong": error[:, 0] * sin_b + error[:, 1] * cos_b,
+            "ErrorCross": error[:, 0] * cos_b - error[:, 1] * sin_b,
+            "ErrorH": np.hypot(error[:, 0], error[:, 1]),
+        },
+        index=input_df.index,
+    )
+    return output_df
+
+
+def error_statistics(error_df, by="Quality"):
+    """
+    Compute statistics of the along-track, cross-track and horizontal error, by fix quality
+    :param error_df: pd.DataFrame()
+        Dataframe containing columns ErrorAlong, ErrorCross and ErrorH, as returned by position_error, and the by
+        column(s)
+    :param by: string or list of string
+        Column(s) used to group the statistics, e.g. 'Quality' or ['Survey', 'Quality']
+    :return: pd.DataFrame()
+        Dataframe with count, mean, standard deviation, median and root mean square of each error component, by group
+    """
+    columns = ["ErrorAlong", "ErrorCross", "ErrorH"]
+    stats_df = error_df.groupby(by)[columns].agg(["count", "mean", "std", "median"])
+    square_df = error_df.copy()
+    square_df[columns] = square_df[columns] ** 2
+    rms_df = np.sqrt(square_df.groupby(by)[columns].mean())
+    rms_df.columns = pd.MultiIndex.from_product([columns, ["rms"]])
+    stats_df = pd.concat([stats_df, rms_df], axis=1)
+    return stats_df[columns]
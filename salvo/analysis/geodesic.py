@@ -0,0 +1,219 @@
+"""
+File to compute distance and azimuth in between geographic coordinates
+
+All functions take arrays of latitude and longitude in decimal degrees and compute all the pairs in one call. Arrays are
+broadcast against each other, so that a single point can be compared to a full track.
+
+Methods:
+    vincenty: ellipsoidal distance on WGS84 (Vincenty inverse formula), accurate to < 1 mm
+    haversine: spherical distance with mean Earth radius; relative error up to 0.6 %, i.e. up to 0.6 m over 100 m
+    flat: local flat-earth approximation using the WGS84 radii of curvature at the mean latitude; for point separated
+        by less than 10 km the relative error is below 1e-5, i.e. below 1 mm over 100 m.
+"""
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0  # semi-major axis, in m
+WGS84_F = 1 / 298.257223563  # flattening
+WGS84_B = WGS84_A * (1 - WGS84_F)  # semi-minor axis, in m
+WGS84_E2 = WGS84_F * (2 - WGS84_F)  # first eccentricity squared
+EARTH_RADIUS = 6371008.8  # mean Earth radius, in m
+
+METHODS = ["vincenty", "haversine", "flat"]
+
+
+def _to_radians(lat1, lon1, lat2, lon2):
+    """
+    Convert and broadcast coordinates in decimal degrees to arrays in radians
+    """
+    return np.broadcast_arrays(
+        *[np.radians(np.asarray(x, dtype=float)) for x in [lat1, lon1, lat2, lon2]]
+    )
+
+
+def _azimuth(y, x):
+    """
+    Return azimuth in degree, clockwise from north in [0, 360[
+    """
+    return np.degrees(np.arctan2(y, x)) % 360
+
+
+def vincenty(lat1, lon1, lat2, lon2, max_iter=200, tol=1e-12):
+    """
+    Compute the ellipsoidal distance and forward azimuth in between points P1 and P2 on WGS84, using Vincenty's inverse
+    formula. Iterations are performed on the full arrays, until all pairs have converged.
+    :param lat1: array_like, float
+        Latitude of point P1, in decimal degrees
+    :param lon1: array_like, float
+        Longitude of point P1, in decimal degrees
+    :param lat2: array_like, float
+        Latitude of point P2, in decimal degrees
+    :param lon2: array_like, float
+        Longitude of point P2, in decimal degrees
+    :param max_iter: int
+        Maximal number of iteration. Nearly antipodal pairs may not converge and are returned as nan.
+    :param tol: float
+        Convergence threshold on the longitude difference on the auxiliary sphere, in radians
+    :return d, az: ndarray, ndarray
+        Distance in m and forward azimuth at P1 in degree, clockwise from north
+    """
+    phi1, lam1, phi2, lam2 = _to_radians(lat1, lon1, lat2, lon2)
+    f = WGS84_F
+
+    u1 = np.arctan((1 - f) * np.tan(phi1))
+    u2 = np.arctan((1 - f) * np.tan(phi2))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    dlam = lam2 - lam1
+    lam = dlam.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(
+                cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam
+            )
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(
+                sin_sigma == 0, 0, cos_u1 * cos_u2 * sin_lam / sin_sigma
+            )
+            cos2_alpha = 1 - sin_alpha**2
+            # cos2_alpha is null for equatorial line
+            cos_2sigma_m = np.where(
+                cos2_alpha == 0, 0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha
+            )
+            c = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = dlam + (1 - c) * f * sin_alpha * (
+                sigma
+                + c
+                * sin_sigma
+                * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m**2))
+            )
+            converged = np.abs(lam - lam_prev) <= tol
+            if np.all(converged | np.isnan(lam)):
+                break
+
+    u2_ = cos2_alpha * (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+    k_a = 1 + u2_ / 16384 * (4096 + u2_ * (-768 + u2_ * (320 - 175 * u2_)))
+    k_b = u2_ / 1024 * (256 + u2_ * (-128 + u2_ * (74 - 47 * u2_)))
+    d_sigma = (
+        k_b
+        * sin_sigma
+        * (
+            cos_2sigma_m
+            + k_b
+            / 4
+            * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m**2)
+                - k_b
+                / 6
+                * cos_2sigma_m
+                * (-3 + 4 * sin_sigma**2)
+                * (-3 + 4 * cos_2sigma_m**2)
+            )
+        )
+    )
+    d = WGS84_B * k_a * (sigma - d_sigma)
+    az = _azimuth(
+        cos_u2 * np.sin(lam), cos_u1 * sin_u2 - sin_u1 * cos_u2 * np.cos(lam)
+    )
+
+    failed = ~converged & ~np.isnan(lam)
+    if np.any(failed):
+        logger.warning(
+            "%d nearly antipodal point pairs did not converge, set to nan",
+            np.sum(failed),
+        )
+        d = np.where(failed, np.nan, d)
+        az = np.where(failed, np.nan, az)
+    return d, az
+
+
+def haversine(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
+    """
+    Compute the great-circle distance and initial bearing in between points P1 and P2 on a sphere.
+    Compared to the WGS84 ellipsoid, the relative error on the distance is up to 0.6 %.
+    :param lat1: array_like, float
+        Latitude of point P1, in decimal degrees
+    :param lon1: array_like, float
+        Longitude of point P1, in decimal degrees
+    :param lat2: array_like, float
+        Latitude of point P2, in decimal degrees
+    :param lon2: array_like, float
+        Longitude of point P2, in decimal degrees
+    :param radius: float
+        Radius of the sphere in m. Default is the mean Earth radius
+    :return d, az: ndarray, ndarray
+        Distance in m and forward azimuth at P1 in degree, clockwise from north
+    """
+    phi1, lam1, phi2, lam2 = _to_radians(lat1, lon1, lat2, lon2)
+    dlam = lam2 - lam1
+    a = (
+        np.sin((phi2 - phi1) / 2) ** 2
+        + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+    )
+    d = 2 * radius * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    az = _azimuth(
+        np.sin(dlam) * np.cos(phi2),
+        np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlam),
+    )
+    return d, az
+
+
+def flat(lat1, lon1, lat2, lon2):
+    """
+    Compute the distance and azimuth in between points P1 and P2 on a local plane tangent to the WGS84 ellipsoid at the
+    mean latitude of P1 and P2. For points separated by less than 10 km, the relative error on the distance is below
+    1e-5.
+    :param lat1: array_like, float
+        Latitude of point P1, in decimal degrees
+    :param lon1: array_like, float
+        Longitude of point P1, in decimal degrees
+    :param lat2: array_like, float
+        Latitude of point P2, in decimal degrees
+    :param lon2: array_like, float
+        Longitude of point P2, in decimal degrees
+    :return d, az: ndarray, ndarray
+        Distance in m and azimuth from P1 to P2 in degree, clockwise from north
+    """
+    phi1, lam1, phi2, lam2 = _to_radians(lat1, lon1, lat2, lon2)
+    phi_m = (phi1 + phi2) / 2
+    w2 = 1 - WGS84_E2 * np.sin(phi_m) ** 2
+    r_n = WGS84_A / np.sqrt(w2)  # prime vertical radius of curvature
+    r_m = WGS84_A * (1 - WGS84_E2) / w2**1.5  # meridional radius of curvature
+    # wrap longitude difference to [-pi, pi[
+    dlam = (lam2 - lam1 + np.pi) % (2 * np.pi) - np.pi
+    d_n = r_m * (phi2 - phi1)
+    d_e = r_n * np.cos(phi_m) * dlam
+    return np.hypot(d_n, d_e), _azimuth(d_e, d_n)
+
+
+def inverse(lat1, lon1, lat2, lon2, method="vincenty"):
+    """
+    Compute the distance and azimuth in between points P1 and P2
+    :param lat1: array_like, float
+        Latitude of point P1, in decimal degrees
+    :param lon1: array_like, float
+        Longitude of point P1, in decimal degrees
+    :param lat2: array_like, float
+        Latitude of point P2, in decimal degrees
+    :param lon2: array_like, float
+        Longitude of point P2, in decimal degrees
+    :param method: string
+        Either 'vincenty' (default), 'haversine' or 'flat'
+    :return d, az: ndarray, ndarray
+        Distance in m and azimuth at P1 in degree, clockwise from north
+    """
+    if method == "vincenty":
+        return vincenty(lat1, lon1, lat2, lon2)
+    if method == "haversine":
+        return haversine(lat1, lon1, lat2, lon2)
+    if method == "flat":
+        return flat(lat1, lon1, lat2, lon2)
+    raise ValueError(f"method should be one of {', '.join(METHODS)}")
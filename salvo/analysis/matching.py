@@ -0,0 +1,129 @@
+"""
+File to match survey points to a position track by location, when timestamps cannot be trusted
+"""
+import logging
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger(__name__)
+
+
+def match_points(query_xy, track_xy, k=1, radius=None, query_time=None, track_time=None):
+    """
+    Find the k nearest track points of each query point, within a search radius. All query points are matched in a
+    single query of a KD-tree built on the track coordinates.
+    :param query_xy: 2darray, float
+        Array of shape (N, 2) with the projected coordinates of the query points (e.g. MagnaProbe X, Y)
+    :param track_xy: 2darray, float
+        Array of shape (M, 2) with the projected coordinates of the track points (e.g. PPK X, Y)
+    :param k: int
+        Number of nearest neighbours to return for each query point
+    :param radius: float or None (default)
+        Search radius in m. If None, neighbours are returned regardless of their distance
+    :param query_time: 1darray, datetime64 or None (default)
+        Timestamp of the query points
+    :param track_time: 1darray, datetime64 or None (default)
+        Timestamp of the track points
+    :return dist, index, dt: 2darray, 2darray, 2darray
+        Arrays of shape (N, k) containing the distance to the neighbours, their index in track_xy and the time
+        difference query_time - track_time. Missing neighbours have a distance of nan, an index of -1 and a time
+        difference of NaT. dt is None if query_time or track_time is not given.
+    """
+    query_xy = np.asarray(query_xy, dtype=float)
+    track_xy = np.asarray(track_xy, dtype=float)
+    n_query = len(query_xy)
+
+    dist = np.full((n_query, k), np.nan)
+    index = np.full((n_query, k), -1, dtype=np.int64)
+
+    # Points with missing coordinates are not matched
+    track_idx = np.flatnonzero(~np.isnan(track_xy).any(axis=1))
+    query_idx = np.flatnonzero(~np.isnan(query_xy).any(axis=1))
+    if len(track_idx) > 0 and len(query_idx) > 0:
+        tree = cKDTree(track_xy[track_idx])
+        upper_bound = np.inf if radius is None else radius
+        _dist, _index = tree.query(
+            query_xy[query_idx], k=k, distance_upper_bound=upper_bound, workers=-1
+        )
+        _dist = _dist.reshape(len(query_idx), k)
+        _index = _index.reshape(len(query_idx), k)
+        found = np.isfinite(_dist)
+        _index = np.where(found, track_idx[np.minimum(_index, len(track_idx) - 1)], -1)
+        dist[query_idx] = np.where(found, _dist, np.nan)
+        index[query_idx] = _index
+
+    if query_time is None or track_time is None:
+        return dist, index, None
+    query_time = np.asarray(query_time, dtype="datetime64[ns]")
+    track_time = np.asarray(track_time, dtype="datetime64[ns]")
+    dt = query_time[:, np.newaxis] - track_time[np.maximum(index, 0)]
+    dt[index < 0] = np.timedelta64("NaT")
+    return dist, index, dt
+
+
+def spatial_match(
+    query_df,
+    track_df,
+    k=1,
+    radius=None,
+    query_columns=("X", "Y"),
+    track_columns=("X", "Y"),
+    time_column="Timestamp",
+):
+    """
+    Match each point of a survey (e.g. MagnaProbe) to the k nearest epochs of a position track (e.g. PPK), within a
+    search radius.
+    :param query_df: pd.DataFrame()
+        Dataframe containing the survey points
+    :param track_df: pd.DataFrame()
+        Dataframe containing the position track
+    :param k: int
+        Number of nearest epochs to return for each survey point
+    :param radius: float or None (default)
+        Search radius in m. If None, epochs are returned regardless of their distance
+    :param query_columns: list of string
+        Name of the X and Y columns in query_df
+    :param track_columns: list of string
+        Name of the X and Y columns in track_df
+    :param time_column: string or None
+        Name of the timestamp column in both dataframes. If None or missing, MatchDeltaT is not computed
+    :return: pd.DataFrame()
+        Dataframe indexed by the query_df index, with one row per survey point and matched epoch, and columns:
+        Neighbor: rank of the epoch, from 0 (nearest) to k-1
+        TrackIndex: index of the epoch in track_df
+        MatchDist: distance in between the survey point and the epoch, in m
+        MatchDeltaT: time difference in between the survey point and the epoch
+    """
+    if time_column in query_df.columns and time_column in track_df.columns:
+        query_time = query_df[time_column].to_numpy()
+        track_time = track_df[time_column].to_numpy()
+    else:
+        query_time, track_time = None, None
+    dist, index, dt = match_points(
+        query_df[list(query_columns)].to_numpy(),
+        track_df[list(track_columns)].to_numpy(),
+        k=k,
+        radius=radius,
+        query_time=query_time,
+        track_time=track_time,
+    )
+
+    found = index >= 0
+    query_pos, neighbor = np.nonzero(found)
+    match_df = pd.DataFrame(
+        {
+            "Neighbor": neighbor,
+            "TrackIndex": track_df.index.to_numpy()[index[found]],
+            "MatchDist": dist[found],
+        },
+        index=query_df.index[query_pos],
+    )
+    if dt is not None:
+        match_df["MatchDeltaT"] = dt[found]
+    if len(np.unique(query_pos)) < len(query_df):
+        logger.warning(
+            "%d points without match within the search radius",
+            len(query_df) - len(np.unique(query_pos)),
+        )
+    return match_df
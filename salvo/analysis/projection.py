@@ -0,0 +1,133 @@
+"""
+Shared coordinate transformation service.
+
+Transformers are built once per process and per (source, target, axis order), and cached. Coordinates are transformed
+in place in contiguous float64 arrays, without intermediate dataframes. Large inputs are split into chunks
+transformed in a thread pool, pyproj releasing the GIL during the transformation.
+
+Example:
+    pos_df["X"], pos_df["Y"] = transform(pos_df["Latitude"], pos_df["Longitude"], target=3338)
+"""
+import concurrent.futures
+import functools
+import logging
+import os
+
+import numpy as np
+import pyproj
+
+logger = logging.getLogger(__name__)
+
+WGS84 = "4326"
+LOCAL_EPSG = 3338  # NAD83 / Alaska Albers
+CHUNK_SIZE = 1 << 18  # Minimal number of points transformed by each thread
+WORKERS = min(4, os.cpu_count() or 1)
+
+
+def get_transformer(source=WGS84, target=LOCAL_EPSG, always_xy=False):
+    """
+    Return the cached transformer between two coordinate reference systems
+    :param source: string or int
+        Source coordinate reference system, e.g. '4326' or 4326
+    :param target: string or int
+        Target coordinate reference system
+    :param always_xy: boolean, default False
+        If True, coordinates are in longitude, latitude (easting, northing) order, otherwise in the axis order of
+        the coordinate reference systems, i.e. latitude, longitude for EPSG:4326
+    :return: pyproj.Transformer
+    """
+    return _cached_transformer(str(source), str(target), bool(always_xy))
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_transformer(source, target, always_xy):
+    """
+    Build a transformer, once per process and per (source, target, axis order)
+    """
+    logger.info("Building transformer from %s to %s", source, target)
+    return pyproj.Transformer.from_crs(source, target, always_xy=always_xy)
+
+
+def _as_float_array(values, inplace):
+    """
+    Return values as a contiguous float64 array of at least one dimension, without copy if inplace is True and values
+    already is a writeable one. Other inputs, e.g. pandas Series, are copied so that their data is not modified.
+    pyproj silently ignores inplace on 0-d arrays: scalars are returned as 1-element arrays.
+    """
+    if (
+        inplace
+        and isinstance(values, np.ndarray)
+        and values.dtype == np.float64
+        and values.flags.c_contiguous
+        and values.flags.writeable
+    ):
+        return np.atleast_1d(values)
+    return np.atleast_1d(np.array(values, dtype=np.float64, order="C"))
+
+
+def transform(
+    xx,
+    yy,
+    zz=None,
+    source=WGS84,
+    target=LOCAL_EPSG,
+    always_xy=False,
+    inplace=False,
+    workers=WORKERS,
+    chunk_size=CHUNK_SIZE,
+):
+    """
+    Transform coordinates between two coordinate reference systems
+    :param xx: array_like
+        First coordinate, e.g. latitude for EPSG:4326 if always_xy is False
+    :param yy: array_like
+        Second coordinate, e.g. longitude for EPSG:4326 if always_xy is False
+    :param zz: array_like, optional
+        Height, transformed as well if given
+    :param source: string or int
+        Source coordinate reference system
+    :param target: string or int
+        Target coordinate reference system
+    :param always_xy: boolean, default False
+        See get_transformer
+    :param inplace: boolean, default False
+        If True, write the output in the input arrays when they are contiguous float64 arrays. Other inputs, e.g.
+        pandas Series or lists, are copied
+    :param workers: int
+        Number of threads used for inputs larger than chunk_size
+    :param chunk_size: int
+        Minimal number of points transformed by each thread
+    :return xx, yy[, zz]: ndarray, ndarray[, ndarray]
+        Transformed coordinates, as floats for scalar inputs
+    """
+    transformer = get_transformer(source, target, always_xy)
+    inputs = [values for values in (xx, yy, zz) if values is not None]
+    scalar = np.ndim(inputs[0]) == 0
+    coords = [_as_float_array(values, inplace) for values in inputs]
+    n = coords[0].size
+    if n <= chunk_size or workers is None or workers <= 1:
+        transformer.transform(*coords, inplace=True)
+        return _output(coords, scalar)
+
+    # One chunk per thread: the first use of a transformer in a thread has a setup cost
+    step = max(chunk_size, -(-n // workers))
+
+    def _transform(start):
+        transformer.transform(
+            *[values.ravel()[start : start + step] for values in coords],
+            inplace=True,
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        # Raise the first error of the threads, if any
+        list(executor.map(_transform, range(0, n, step)))
+    return _output(coords, scalar)
+
+
+def _output(coords, scalar):
+    """
+    Return the transformed coordinates, as floats for scalar inputs
+    """
+    if scalar:
+        return tuple(float(values[0]) for values in coords)
+    return tuple(coords)
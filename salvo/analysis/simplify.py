@@ -0,0 +1,88 @@
+"""
+File to simplify position tracks
+"""
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _segment_distance(pts, p_a, p_b):
+    """
+    Compute distance in between points and the segment [P_A, P_B]
+    :param pts: 2darray, float
+        Array of shape (N, D) containing the points
+    :param p_a: 1darray, float
+        First point of the segment
+    :param p_b: 1darray, float
+        Last point of the segment
+    :return d: 1darray
+        Distance of each point to the segment
+    """
+    v = p_b - p_a
+    w = pts - p_a
+    v2 = np.dot(v, v)
+    if v2 == 0:
+        return np.sqrt(np.sum(w**2, axis=1))
+    t = np.clip(w @ v / v2, 0, 1)
+    return np.sqrt(np.sum((w - t[:, np.newaxis] * v) ** 2, axis=1))
+
+
+def douglas_peucker(xyz, tolerance):
+    """
+    Simplify a track with the Ramer-Douglas-Peucker algorithm. The algorithm is run iteratively with a stack of
+    segments, and the distance of all points of a segment is computed at once.
+    :param xyz: 2darray, float
+        Array of shape (N, D) containing the coordinates of the track in m, e.g. X, Y or X, Y, Z
+    :param tolerance: float
+        Maximal distance in m in between the original track and the simplified track
+    :return index: 1darray, int
+        Sorted index of the points kept in the simplified track. Points with missing coordinates are dropped.
+    """
+    xyz = np.asarray(xyz, dtype=float)
+    if xyz.ndim == 1:
+        xyz = xyz[:, np.newaxis]
+    valid_idx = np.flatnonzero(~np.isnan(xyz).any(axis=1))
+    pts = xyz[valid_idx]
+    n_pts = len(pts)
+    if n_pts < 3:
+        return valid_idx
+
+    keep = np.zeros(n_pts, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n_pts - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        d = _segment_distance(pts[first + 1 : last], pts[first], pts[last])
+        ii_max = np.argmax(d)
+        if d[ii_max] > tolerance:
+            ii_max += first + 1
+            keep[ii_max] = True
+            stack.append((first, ii_max))
+            stack.append((ii_max, last))
+    return valid_idx[keep]
+
+
+def simplify_track(input_df, tolerance, columns=("X", "Y")):
+    """
+    Simplify a position track, keeping the original index of the epochs so that the simplified track can be joined
+    back with the original data.
+    :param input_df: pd.DataFrame()
+        Dataframe containing the position track
+    :param tolerance: float
+        Maximal distance in m in between the original track and the simplified track
+    :param columns: list of string
+        Name of the coordinate columns, e.g. ['X', 'Y'] or ['X', 'Y', 'Z']
+    :return: pd.DataFrame()
+        Subset of input_df with the epochs of the simplified track
+    """
+    index = douglas_peucker(input_df[list(columns)].to_numpy(dtype=float), tolerance)
+    logger.info(
+        "Track simplified from %d to %d epochs with a tolerance of %.3f m",
+        len(input_df),
+        len(index),
+        tolerance,
+    )
+    return input_df.iloc[index]
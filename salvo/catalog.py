@@ -0,0 +1,304 @@
+"""
+Persistent catalog of the SALVO data tree, stored in a SQLite database.
+
+The catalog stores the parsed naming fields, size, modification time and processing level of every file. Rescans only
+list the directories whose modification time changed since the last scan; unchanged directories are only stat-ed.
+Queries are answered from the database without walking the data tree.
+
+Example:
+    catalog = Catalog("/home/user/.salvo/catalog.sqlite")
+    catalog.scan("/mnt/data/UAF-data/working_a/SALVO/")
+    catalog.latest(site="beo", location="line", extension="csv")
+    catalog.query(survey_date="2024-06-08", survey_site="beo", log_type="event")
+"""
+import logging
+import os
+import sqlite3
+
+import pandas as pd
+
+from salvo.naming.parser import parse_name
+
+logger = logging.getLogger(__name__)
+
+FILE_COLUMNS = [
+    "path",
+    "directory",
+    "filename",
+    "size",
+    "mtime",
+    "site",
+    "location",
+    "instrument",
+    "log_type",
+    "sample_rate",
+    "datetime",
+    "level",
+    "grade",
+    "level_number",
+    "extension",
+    "survey_date",
+    "survey_site",
+]
+# Fields identifying a product, regardless of its processing level
+PRODUCT_COLUMNS = [
+    "site",
+    "location",
+    "instrument",
+    "log_type",
+    "sample_rate",
+    "datetime",
+    "extension",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime INTEGER
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT,
+    filename TEXT,
+    size INTEGER,
+    mtime INTEGER,
+    site TEXT,
+    location TEXT,
+    instrument TEXT,
+    log_type TEXT,
+    sample_rate REAL,
+    datetime TEXT,
+    level TEXT,
+    grade TEXT,
+    level_number INTEGER,
+    extension TEXT,
+    survey_date TEXT,
+    survey_site TEXT
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+CREATE INDEX IF NOT EXISTS files_survey ON files (survey_date, survey_site);
+CREATE INDEX IF NOT EXISTS files_product ON files (site, location, grade, level_number);
+"""
+
+
+def _file_record(path, stat):
+    """
+    Return the catalog record of a file
+    :param path: string
+        Filepath
+    :param stat: os.stat_result
+        Status of the file
+    :return: tuple
+        Record with values ordered as FILE_COLUMNS
+    """
+    name = parse_name(path)
+    grade, level_number = None, None
+    if name.level is not None:
+        grade = name.level[0] if name.level != "00" else "0"
+        level_number = int(name.level[1:]) if name.level != "00" else 0
+    return (
+        path,
+        os.path.dirname(path),
+        os.path.basename(path),
+        stat.st_size,
+        stat.st_mtime_ns,
+        name.site,
+        name.location,
+        name.instrument,
+        name.log_type,
+        name.sample_rate,
+        None if name.datetime is None else name.datetime.isoformat(),
+        name.level,
+        grade,
+        level_number,
+        name.extension,
+        None if name.survey_date is None else name.survey_date.isoformat(),
+        name.survey_site,
+    )
+
+
+class Catalog:
+    """
+    Catalog of the files of the SALVO data tree
+    """
+
+    def __init__(self, db_fp):
+        """
+        :param db_fp: string
+            Path to the SQLite database. It is created if it does not exist. It should be stored on a local disk.
+        """
+        if os.path.dirname(db_fp) and not os.path.exists(os.path.dirname(db_fp)):
+            os.makedirs(os.path.dirname(db_fp))
+        self.db_fp = db_fp
+        self.connection = sqlite3.connect(db_fp)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """
+        Close the database connection
+        """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _remove_directory(self, path):
+        """
+        Remove a directory, its subdirectories and their files from the catalog. Subdirectories are matched on their
+        path prefix with substr rather than LIKE, in which the '_' and '%' of paths would be wildcards.
+        """
+        prefix = path.rstrip("/") + "/"
+        self.connection.execute(
+            "DELETE FROM files WHERE directory = ? OR substr(directory, 1, ?) = ?",
+            (path, len(prefix), prefix),
+        )
+        self.connection.execute(
+            "DELETE FROM directories WHERE path = ? OR substr(path, 1, ?) = ?",
+            (path, len(prefix), prefix),
+        )
+
+    def scan(self, root, full=False):
+        """
+        Update the catalog with the content of the directory tree. Only directories whose modification time changed
+        since the last scan are listed. Files rewritten in place do not change the modification time of their
+        directory: use full=True to list every directory.
+        :param root: string
+            Root of the directory tree
+        :param full: boolean, default False
+            If True, list every directory regardless of its modification time
+        :return n_scanned: int
+            Number of directories listed
+        """
+        root = os.path.normpath(root)
+        n_scanned = 0
+        stack = [(root, os.path.dirname(root))]
+        with self.connection:
+            while stack:
+                directory, parent = stack.pop()
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except (FileNotFoundError, NotADirectoryError):
+                    self._remove_directory(directory)
+                    continue
+
+                row = self.connection.execute(
+                    "SELECT mtime FROM directories WHERE path = ?", (directory,)
+                ).fetchone()
+                if not full and row is not None and row[0] == mtime:
+                    # Unchanged directory: descend into the known subdirectories
+                    subdirs = self.connection.execute(
+                        "SELECT path FROM directories WHERE parent = ?", (directory,)
+                    ).fetchall()
+                    stack.extend((subdir, directory) for (subdir,) in subdirs)
+                    continue
+
+                n_scanned += 1
+                records, subdirs = [], []
+                try:
+                    with os.scandir(directory) as it:
+                        for entry in it:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.is_file():
+                                records.append(_file_record(entry.path, entry.stat()))
+                except PermissionError:
+                    logger.warning(str("Permission denied: " + directory))
+                    continue
+
+                # Remove files and subdirectories which do not exist anymore
+                known_files = self.connection.execute(
+                    "SELECT path FROM files WHERE directory = ?", (directory,)
+                ).fetchall()
+                paths = {record[0] for record in records}
+                self.connection.executemany(
+                    "DELETE FROM files WHERE path = ?",
+                    [(path,) for (path,) in known_files if path not in paths],
+                )
+                known_subdirs = self.connection.execute(
+                    "SELECT path FROM directories WHERE parent = ?", (directory,)
+                ).fetchall()
+                for (subdir,) in known_subdirs:
+                    if subdir not in subdirs:
+                        self._remove_directory(subdir)
+
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO files ("
+                    + ", ".join(FILE_COLUMNS)
+                    + ") VALUES ("
+                    + ", ".join(["?"] * len(FILE_COLUMNS))
+                    + ")",
+                    records,
+                )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO directories (path, parent, mtime) VALUES (?, ?, ?)",
+                    (directory, parent, mtime),
+                )
+                stack.extend((subdir, directory) for subdir in subdirs)
+        logger.info("%d directories scanned in %s", n_scanned, root)
+        return n_scanned
+
+    @staticmethod
+    def _where(filters):
+        """
+        Return the SQL WHERE clause and parameters for equality filters. None values are ignored.
+        """
+        clauses, params = [], []
+        for key, value in filters.items():
+            if key not in FILE_COLUMNS:
+                raise ValueError(str("Unknown catalog field: " + key))
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append(key + " IN (" + ", ".join(["?"] * len(value)) + ")")
+                params.extend(value)
+            else:
+                clauses.append(key + " = ?")
+                params.append(value)
+        if not clauses:
+            return "", params
+        return " WHERE " + " AND ".join(clauses), params
+
+    def query(self, **filters):
+        """
+        Return the files matching all the filters
+        :param filters: keyword arguments
+            Field of FILE_COLUMNS and value, or list of values, to match. Dates are formatted as YYYY-MM-DD, e.g.
+            survey_date='2024-06-08', survey_site='beo', log_type='event'
+        :return: pd.DataFrame()
+            Dataframe with one row per file and columns FILE_COLUMNS
+        """
+        where, params = self._where(filters)
+        return pd.read_sql_query(
+            "SELECT * FROM files" + where + " ORDER BY path",
+            self.connection,
+            params=params,
+        )
+
+    def latest(self, grade="a", **filters):
+        """
+        Return the file with the highest processing level of each product, e.g. the latest aN product for each
+        site, location and date
+        :param grade: string
+            Processing grade: '0' (raw), 'a' or 'b'
+        :param filters: keyword arguments
+            Field of FILE_COLUMNS and value, or list of values, to match
+        :return: pd.DataFrame()
+            Dataframe with one row per product and columns FILE_COLUMNS
+        """
+        filters["grade"] = grade
+        where, params = self._where(filters)
+        sql = (
+            "SELECT "
+            + ", ".join(FILE_COLUMNS)
+            + " FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY "
+            + ", ".join(PRODUCT_COLUMNS)
+            + " ORDER BY level_number DESC, mtime DESC) AS rank FROM files"
+            + where
+            + ") WHERE rank = 1 ORDER BY path"
+        )
+        return pd.read_sql_query(sql, self.connection, params=params)
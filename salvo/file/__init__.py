@@ -1,5 +1,15 @@
+import concurrent.futures
+import fnmatch
+import logging
 import os
 
+from salvo.naming.parser import parse_name
+
+logger = logging.getLogger(__name__)
+
+# Subdirectories pruned by walk_files: copies of the original raw files and backups
+EXCLUDE_DIRS = ("original", "backup*", "bkp*", ".*")
+
 
 def list_folder_recursive(path):
     """
@@ -7,14 +17,7 @@ def list_folder_recursive(path):
     :param path: string, path to the folder
     :return: list of strings, containing the file path of each file
     """
-    filelists = []
-    for entry in os.listdir(path):
-        full_path = os.path.join(path, entry)
-        if os.path.isdir(full_path):
-            filelists.extend(list_folder_recursive(full_path))
-        else:
-            filelists.append(full_path)
-    return filelists
+    return list(walk_files(path, exclude=()))
 
 
 def select_extension(filelists, extensions):
@@ -29,3 +32,92 @@ def select_extension(filelists, extensions):
         extensions = [extensions]
     return [f for f in filelists if f.split('.')[-1] in extensions]
 
+
+def _file_filter(extensions=None, pattern=None, fields=None):
+    """
+    Return a function selecting filepaths by extension, filename glob pattern and SALVO naming fields
+    """
+    if extensions is not None and not isinstance(extensions, (list, tuple, set)):
+        extensions = [extensions]
+    fields = {
+        key: value if isinstance(value, (list, tuple, set)) else [value]
+        for key, value in (fields or {}).items()
+    }
+
+    def match(name, path):
+        if extensions is not None and name.split('.')[-1] not in extensions:
+            return False
+        if pattern is not None and not fnmatch.fnmatch(name, pattern):
+            return False
+        if fields:
+            salvo_name = parse_name(path)
+            for key, values in fields.items():
+                if getattr(salvo_name, key) not in values:
+                    return False
+        return True
+
+    return match
+
+
+def _scan_directory(path, match, exclude):
+    """
+    List a directory with a single os.scandir call
+    :return files, subdirs: list of string, list of string
+        Filepaths of the selected files, and paths of the subdirectories not excluded
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    if not any(fnmatch.fnmatch(entry.name, excl) for excl in exclude):
+                        subdirs.append(entry.path)
+                elif match(entry.name, entry.path):
+                    files.append(entry.path)
+    except PermissionError:
+        logger.warning('Permission denied: %s', path)
+    return files, subdirs
+
+
+def walk_files(path, extensions=None, pattern=None, exclude=EXCLUDE_DIRS, workers=None, **fields):
+    """
+    Yield the files within a folder and its subfolders, filtered while walking. Excluded subdirectories are not
+    listed at all.
+    :param path: string
+        Path to the folder
+    :param extensions: string or list of string, optional
+        Extension or list of extensions to select, e.g. 'csv' or ['pos', 'csv']
+    :param pattern: string, optional
+        Glob pattern on the filename, e.g. 'salvo_*_magnaprobe*.a*.csv'
+    :param exclude: list of string
+        Glob patterns of the subdirectory names to prune. Defaults to EXCLUDE_DIRS; use () to walk every subdirectory.
+    :param workers: int, optional
+        Number of threads listing sibling directories concurrently, useful on high-latency network mounts. If None,
+        the directories are listed sequentially.
+    :param fields: keyword arguments
+        SALVO naming fields and value, or list of values, to select, e.g. site='beo', level='b0', log_type='event'.
+        See salvo.naming.parser.SalvoName
+    :return: generator of string
+        File path of each selected file
+    """
+    match = _file_filter(extensions, pattern, fields)
+    if not workers or workers < 2:
+        stack = [path]
+        while stack:
+            files, subdirs = _scan_directory(stack.pop(), match, exclude)
+            yield from files
+            stack.extend(reversed(subdirs))
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_scan_directory, path, match, exclude)}
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                files, subdirs = future.result()
+                pending.update(
+                    executor.submit(_scan_directory, subdir, match, exclude) for subdir in subdirs
+                )
+                yield from files
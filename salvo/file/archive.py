@@ -0,0 +1,261 @@
+"""
+Access to the members of emlid zip-archives without extracting them to disk.
+
+Members (RINEX observation and navigation files, .pos files, UBX logs) are opened as binary file-like objects and read
+in fixed-size chunks, so that scanners and parsers work on zip-archive members in place. Members are renamed by copying
+their compressed data under a new name, without decompression, and extracted with a bounded memory use.
+
+Example:
+    with open_member(zip_fp, "rinex/reachm2_raw_20240525194700.24O") as f:
+        interval = rinex.sampling_interval(f)
+"""
+import concurrent.futures
+import contextlib
+import logging
+import os
+import shutil
+import struct
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+def iter_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """
+    Yield the content of a binary file-like object in fixed-size chunks
+    :param fileobj: file-like object
+        Binary file-like object, e.g. an opened file or a zip-archive member
+    :param chunk_size: int
+        Size of the chunks in bytes
+    :return: generator of bytes
+    """
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        yield chunk
+
+
+def list_members(archive, extensions=None):
+    """
+    Return the file members of a zip-archive, skipping directories
+    :param archive: string or zipfile.ZipFile
+        Zip-archive filepath or opened zip-archive
+    :param extensions: string or list of string, optional
+        Extension or list of extensions to select, e.g. '24O' or ['24O', '24P', 'ubx']
+    :return: list of zipfile.ZipInfo
+    """
+    if extensions is not None and not isinstance(extensions, (list, tuple, set)):
+        extensions = [extensions]
+    if not isinstance(archive, zipfile.ZipFile):
+        with zipfile.ZipFile(archive) as zf:
+            return list_members(zf, extensions)
+    return [
+        info
+        for info in archive.infolist()
+        if not info.is_dir()
+        and (extensions is None or info.filename.split(".")[-1] in extensions)
+    ]
+
+
+@contextlib.contextmanager
+def open_member(archive, member):
+    """
+    Open a member of a zip-archive as a binary file-like object, decompressed on the fly
+    :param archive: string or zipfile.ZipFile
+        Zip-archive filepath or opened zip-archive
+    :param member: string or zipfile.ZipInfo
+        Member name or information
+    :return: zipfile.ZipExtFile
+    """
+    if isinstance(archive, zipfile.ZipFile):
+        with archive.open(member) as f:
+            yield f
+        return
+    with zipfile.ZipFile(archive) as zf, zf.open(member) as f:
+        yield f
+
+
+def iter_member_chunks(archive, member, chunk_size=CHUNK_SIZE):
+    """
+    Yield the content of a zip-archive member in fixed-size chunks
+    :param archive: string or zipfile.ZipFile
+        Zip-archive filepath or opened zip-archive
+    :param member: string or zipfile.ZipInfo
+        Member name or information
+    :param chunk_size: int
+        Size of the chunks in bytes
+    :return: generator of bytes
+    """
+    with open_member(archive, member) as f:
+        yield from iter_chunks(f, chunk_size)
+
+
+def plan_rename(archive, rename):
+    """
+    Return the renaming plan of the members of a zip-archive, without writing anything
+    :param archive: string or zipfile.ZipFile
+        Zip-archive filepath or opened zip-archive
+    :param rename: callable
+        Function returning the new name of a member from its name, or None to drop the member
+    :return plan: list of tuple
+        List of (old name, new name) for each member, in archive order. New name is None for dropped members
+    """
+    if not isinstance(archive, zipfile.ZipFile):
+        with zipfile.ZipFile(archive) as zf:
+            return plan_rename(zf, rename)
+    plan = [(info.filename, rename(info.filename)) for info in archive.infolist()]
+    new_names = [new for _, new in plan if new is not None]
+    if len(set(new_names)) < len(new_names):
+        raise ValueError("Renaming plan maps several members to the same name")
+    return plan
+
+
+def _data_offset(fp, info):
+    """
+    Return the offset of the compressed data of a member, after its local file header
+    """
+    fp.seek(info.header_offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    if header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(str("Bad local file header for " + info.filename))
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    return (
+        info.header_offset
+        + zipfile.sizeFileHeader
+        + fields[zipfile._FH_FILENAME_LENGTH]
+        + fields[zipfile._FH_EXTRA_FIELD_LENGTH]
+    )
+
+
+def rename_members(src_fp, dst_fp, rename, chunk_size=CHUNK_SIZE):
+    """
+    Write a copy of a zip-archive with renamed members. The compressed data of each member is copied as is under the
+    new name, keeping compression, CRC and sizes: nothing is decompressed nor recompressed.
+    :param src_fp: string
+        Source zip-archive filepath
+    :param dst_fp: string
+        Target zip-archive filepath
+    :param rename: callable
+        Function returning the new name of a member from its name, or None to drop the member
+    :param chunk_size: int
+        Size of the chunks in bytes
+    :return plan: list of tuple
+        List of (old name, new name) for each member, see plan_rename
+    """
+    with zipfile.ZipFile(src_fp) as zin:
+        plan = plan_rename(zin, rename)
+        with open(src_fp, "rb") as fin, zipfile.ZipFile(dst_fp, "w") as zout:
+            for info, (_, new_name) in zip(zin.infolist(), plan):
+                if new_name is None:
+                    continue
+                if info.flag_bits & 0x1:
+                    raise NotImplementedError(
+                        "Encrypted zip-archive members are not supported"
+                    )
+                new_info = zipfile.ZipInfo(new_name, info.date_time)
+                for attr in [
+                    "compress_type",
+                    "comment",
+                    "create_system",
+                    "create_version",
+                    "extract_version",
+                    "internal_attr",
+                    "external_attr",
+                    "CRC",
+                    "compress_size",
+                    "file_size",
+                ]:
+                    setattr(new_info, attr, getattr(info, attr))
+                # Sizes are written in the local header: no data descriptor
+                new_info.flag_bits = info.flag_bits & ~0x08
+                new_info.extra = zipfile._strip_extra(info.extra, (1,))  # zip64 extra
+                zip64 = max(info.file_size, info.compress_size) > zipfile.ZIP64_LIMIT
+
+                fin.seek(_data_offset(fin, info))
+                new_info.header_offset = zout.fp.tell()
+                zout.fp.write(new_info.FileHeader(zip64))
+                remaining = info.compress_size
+                while remaining > 0:
+                    chunk = fin.read(min(chunk_size, remaining))
+                    if not chunk:
+                        raise zipfile.BadZipFile(
+                            str("Truncated member " + info.filename)
+                        )
+                    zout.fp.write(chunk)
+                    remaining -= len(chunk)
+
+                zout.filelist.append(new_info)
+                zout.NameToInfo[new_name] = new_info
+                zout.start_dir = zout.fp.tell()
+                zout._didModify = True
+    logger.info(
+        "%s: %d members renamed",
+        os.path.basename(dst_fp),
+        sum(old != new for old, new in plan if new is not None),
+    )
+    return plan
+
+
+def _member_path(target, name):
+    """
+    Return the output filepath of a member in the target directory. Members whose path resolves outside the target
+    directory, e.g. with an absolute name or '..' components (zip-slip), are rejected.
+    """
+    target_fp = os.path.join(target, name)
+    target_dir = os.path.realpath(target)
+    if os.path.commonpath([target_dir, os.path.realpath(target_fp)]) != target_dir:
+        raise ValueError(
+            str("Member " + name + " would be extracted outside " + target)
+        )
+    return target_fp
+
+
+def _extract_member(archive_fp, member, target_fp, chunk_size):
+    """
+    Stream a zip-archive member to a file, with a fixed-size buffer
+    """
+    os.makedirs(os.path.dirname(target_fp), exist_ok=True)
+    with zipfile.ZipFile(archive_fp) as zf, zf.open(member) as f_src:
+        with open(target_fp, "wb") as f_dst:
+            shutil.copyfileobj(f_src, f_dst, chunk_size)
+    return target_fp
+
+
+def extract_members(
+    archive_fp, target, extensions=None, members=None, workers=4, chunk_size=CHUNK_SIZE
+):
+    """
+    Extract selected members of a zip-archive. Members are selected on the archive directory, before opening any
+    of them, and streamed to disk with a fixed-size buffer, so that memory use does not depend on the member size.
+    Members are extracted concurrently, each thread with its own handle on the archive.
+    :param archive_fp: string
+        Zip-archive filepath
+    :param target: string or callable
+        Output directory, in which the member path is kept, or function returning the output filepath of a member
+        from its name. With an output directory, members resolving outside of it raise a ValueError before any
+        extraction
+    :param extensions: string or list of string, optional
+        Extension or list of extensions to select, e.g. ['24O', '24P']
+    :param members: list of string or zipfile.ZipInfo, optional
+        Members to extract. Defaults to all the file members with the selected extensions
+    :param workers: int
+        Number of threads
+    :param chunk_size: int
+        Size of the copy buffer in bytes
+    :return: dict
+        Dictionary with member name as key and output filepath as value, in archive order
+    """
+    if members is None:
+        members = list_members(archive_fp, extensions)
+    names = [m.filename if isinstance(m, zipfile.ZipInfo) else m for m in members]
+    if callable(target):
+        target_fps = [target(name) for name in names]
+    else:
+        target_fps = [_member_path(target, name) for name in names]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_extract_member, archive_fp, name, target_fp, chunk_size)
+            for name, target_fp in zip(names, target_fps)
+        ]
+        return {name: future.result() for name, future in zip(names, futures)}
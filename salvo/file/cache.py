@@ -0,0 +1,320 @@
+"""
+Cache of parsed and projected position tables.
+
+Position files are parsed with salvo.file.pos.read_pos, projected to a local coordinate system and, optionally,
+completed with the track distances. The resulting table is stored as a bundle of .npy files, one per column, in a
+hidden .cache directory next to the source file. Bundles are keyed by the SHA-256 digest of the source file and by the
+parser and projection parameters, so that a modified source file or a new parameter gives a new entry. The size of a
+cache directory is capped, the least recently used bundles being evicted first.
+
+Example:
+    pos_df = read_positions(EMLID_FP, epsg=3338, distance=True)
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from salvo.analysis.distance import compute_distance
+from salvo.analysis.projection import transform
+from salvo.file.pos import (
+    CACHE_DIRNAME,
+    POS_COLUMNS,
+    first_epoch,
+    read_pos,
+    read_pos_window,
+)
+from salvo.file.store import sha256
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 3  # Increase when the content of the cached tables changes
+INDEX_FN = "index.json"
+META_FN = "meta.json"
+MAX_CACHE_SIZE = 1 << 30  # 1 GiB
+
+
+def _dir_size(path):
+    """
+    Return the total size in bytes of the files of a directory
+    """
+    with os.scandir(path) as it:
+        return sum(entry.stat().st_size for entry in it if entry.is_file())
+
+
+def _column_array(series):
+    """
+    Return a column as an array that can be saved and memory-mapped without pickle. Columns of strings are stored as
+    fixed-width unicode, missing values becoming empty strings. Other object columns cannot be cached.
+    """
+    values = series.to_numpy()
+    if values.dtype.hasobject:
+        valid = series.dropna()
+        if not all(isinstance(value, str) for value in valid):
+            raise TypeError(
+                str("Column " + str(series.name) + " of dtype object cannot be cached")
+            )
+        values = series.fillna("").to_numpy(dtype=str)
+    return values
+
+
+class TableCache:
+    """
+    Directory of dataframes stored as bundles of .npy files, with least recently used eviction
+    """
+
+    def __init__(self, cache_dir, max_size=MAX_CACHE_SIZE):
+        """
+        :param cache_dir: string
+            Cache directory
+        :param max_size: int
+            Maximal size of the cache directory in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.index_fp = os.path.join(cache_dir, INDEX_FN)
+        self.index = {}
+        if os.path.exists(self.index_fp):
+            with open(self.index_fp, "r", encoding="UTF-8") as f:
+                self.index = json.load(f)
+
+    def digest(self, fp):
+        """
+        Return the SHA-256 digest of a file. The digest is only computed if the size or modification time of the file
+        differs from the ones recorded in the index.
+        :param fp: string
+            Filepath
+        :return digest: string
+            Hexadecimal digest
+        """
+        fp = os.path.abspath(fp)
+        stat = os.stat(fp)
+        record = self.index.get(fp)
+        if record is not None and record[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return record[2]
+        digest = sha256(fp)
+        self.index[fp] = [stat.st_size, stat.st_mtime_ns, digest]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_fp = self.index_fp + "." + str(os.getpid())
+        with open(tmp_fp, "w", encoding="UTF-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_fp, self.index_fp)
+        return digest
+
+    @staticmethod
+    def key(digest, params):
+        """
+        Return the cache key of a source digest and of the parameters used to compute the cached table
+        :param digest: string
+            Digest of the source file
+        :param params: dict
+            Parameters, serializable in json
+        :return key: string
+        """
+        params = dict(params, version=CACHE_VERSION)
+        content = digest + json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode("UTF-8")).hexdigest()[:32]
+
+    def bundle_path(self, key):
+        """
+        Return the directory of the bundle of a key
+        """
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key):
+        """
+        Load a cached dataframe. The .npy files are memory-mapped copy-on-write.
+        :param key: string
+            Cache key
+        :return df: pd.DataFrame() or None
+            Cached dataframe, None if the key is not cached
+        """
+        bundle_dir = self.bundle_path(key)
+        meta_fp = os.path.join(bundle_dir, META_FN)
+        try:
+            with open(meta_fp, "r", encoding="UTF-8") as f:
+                meta = json.load(f)
+            df = pd.DataFrame(
+                {
+                    column: np.load(
+                        os.path.join(bundle_dir, str(ii) + ".npy"), mmap_mode="c"
+                    )
+                    for ii, column in enumerate(meta["columns"])
+                }
+            )
+        except (OSError, ValueError, KeyError):
+            return None
+        df.attrs.update(meta["attrs"])
+        # Mark the bundle as recently used
+        os.utime(meta_fp)
+        return df
+
+    def save(self, key, df):
+        """
+        Store a dataframe in the cache, then evict the least recently used bundles above the maximal size
+        :param key: string
+            Cache key
+        :param df: pd.DataFrame()
+            Dataframe with numeric, datetime or string columns. Other object columns raise a TypeError, before anything
+            is written
+        """
+        # Convert all the columns first, not to write bundles that cannot be read back
+        arrays = [_column_array(df[column]) for column in df.columns]
+        bundle_dir = self.bundle_path(key)
+        tmp_dir = bundle_dir + "." + str(os.getpid())
+        os.makedirs(tmp_dir, exist_ok=True)
+        for ii, values in enumerate(arrays):
+            np.save(os.path.join(tmp_dir, str(ii) + ".npy"), values, allow_pickle=False)
+        meta = {"columns": list(df.columns), "attrs": dict(df.attrs)}
+        with open(os.path.join(tmp_dir, META_FN), "w", encoding="UTF-8") as f:
+            json.dump(meta, f, default=str)
+        if os.path.exists(bundle_dir):
+            shutil.rmtree(bundle_dir)
+        os.replace(tmp_dir, bundle_dir)
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used bundles until the cache is smaller than its maximal size
+        :param keep: string, optional
+            Key of a bundle never to remove, e.g. the one just saved
+        """
+        bundles = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                meta_fp = os.path.join(entry.path, META_FN)
+                if entry.is_dir() and os.path.exists(meta_fp):
+                    bundles.append(
+                        (os.stat(meta_fp).st_mtime, entry.name, _dir_size(entry.path))
+                    )
+        total = sum(size for _, _, size in bundles)
+        for _, key, size in sorted(bundles):
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            logger.info(str("Evicting cached table " + key))
+            shutil.rmtree(self.bundle_path(key), ignore_errors=True)
+            total -= size
+
+
+def project_positions(pos_df, epsg, distance=False, origin_pt=None):
+    """
+    Add the local coordinates X, Y and Z to a position dataframe, and optionally the track distances
+    :param pos_df: pd.DataFrame()
+        Position dataframe, as returned by read_pos, with renamed or original column names
+    :param epsg: int
+        EPSG code of the local coordinate system, e.g. 3338
+    :param distance: boolean, default False
+        If True, add the columns TrackDist, TrackDistCum and DistOrigin
+    :param origin_pt: 1darray or None (default)
+        Origin point [x0, y0, z0] of DistOrigin, see compute_distance. If None, the first point of pos_df
+    :return pos_df: pd.DataFrame()
+    """
+    lat, lon, alt = [
+        name if name in pos_df.columns else POS_COLUMNS[name]
+        for name in ["latitude(deg)", "longitude(deg)", "height(m)"]
+    ]
+    pos_df["X"], pos_df["Y"] = transform(pos_df[lat], pos_df[lon], target=epsg)
+    pos_df["Z"] = pos_df[alt]
+    if distance:
+        pos_df[["TrackDist", "TrackDistCum", "DistOrigin"]] = compute_distance(
+            pos_df[["X", "Y", "Z"]], origin_pt=origin_pt
+        )
+    return pos_df
+
+
+def read_positions(
+    fp,
+    utc=True,
+    rename=True,
+    usecols=None,
+    epsg=None,
+    distance=False,
+    start=None,
+    end=None,
+    cache_dir=None,
+    max_size=MAX_CACHE_SIZE,
+):
+    """
+    Read a position file, projected to a local coordinate system, from the cache if available. Otherwise, the file is
+    parsed with read_pos, projected with project_positions and the resulting table is cached.
+    :param fp: string
+        Position filepath
+    :param utc: boolean, default True
+        See read_pos
+    :param rename: boolean or dict, default True
+        See read_pos
+    :param usecols: list of string, optional
+        See read_pos
+    :param epsg: int, optional
+        EPSG code of the local coordinate system. If None, positions are not projected
+    :param distance: boolean, default False
+        If True, add the track distances. Requires epsg. DistOrigin is always measured from the first position of the
+        file, read from the first indexed line with a time window. TrackDistCum is cumulated within the window
+    :param start: datetime-like, optional
+        If given, read only the rows from start, see read_pos_window
+    :param end: datetime-like, optional
+        If given, read only the rows until end, see read_pos_window
+    :param cache_dir: string or False, optional
+        Cache directory. Defaults to a .cache directory next to the position file. If False, the cache is not used
+    :param max_size: int
+        Maximal size of the cache directory in bytes
+    :return pos_df: pd.DataFrame()
+    """
+    params = {
+        "utc": utc,
+        "rename": rename,
+        "usecols": usecols,
+        "epsg": epsg,
+        "distance": distance,
+        "start": start,
+        "end": end,
+    }
+    if cache_dir is False:
+        return _read_positions(fp, **params)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(fp)), CACHE_DIRNAME)
+    cache = TableCache(cache_dir, max_size=max_size)
+    key = cache.key(cache.digest(fp), params)
+    pos_df = cache.load(key)
+    if pos_df is not None:
+        logger.info(str("Loaded cached table of " + fp))
+        return pos_df
+    pos_df = _read_positions(fp, **params)
+    try:
+        cache.save(key, pos_df)
+    except TypeError as error:
+        logger.warning(str("Table of " + fp + " not cached: " + str(error)))
+    return pos_df
+
+
+def _read_positions(fp, utc, rename, usecols, epsg, distance, start, end):
+    """
+    Parse and project a position file, without cache
+    """
+    if start is None and end is None:
+        pos_df = read_pos(fp, utc=utc, rename=rename, usecols=usecols)
+        if epsg is not None:
+            pos_df = project_positions(pos_df, epsg, distance=distance)
+        return pos_df
+
+    pos_df = read_pos_window(
+        fp, start=start, end=end, utc=utc, rename=rename, usecols=usecols
+    )
+    if epsg is None:
+        return pos_df
+    origin_pt = None
+    t0 = first_epoch(fp, utc=utc) if distance else None
+    if t0 is not None:
+        # Origin of the file, from its first line only
+        origin_df = read_pos_window(
+            fp, start=t0, end=t0, utc=utc, rename=rename, usecols=usecols
+        )
+        origin_df = project_positions(origin_df.iloc[:1].copy(), epsg)
+        origin_pt = origin_df[["X", "Y", "Z"]].to_numpy(dtype=float)[0]
+    return project_positions(pos_df, epsg, distance=distance, origin_pt=origin_pt)
@@ -0,0 +1,477 @@
+"""
+Reader for Emlid Studio / RTKLIB position (.pos) files.
+
+The header block, made of the lines starting with '%', is detected instead of assumed. The column line is the last
+header line, e.g.
+    %  GPST                  latitude(deg) longitude(deg)  height(m)   Q  ns   sdn(m)   sde(m) ...
+    2024/05/25 19:47:00.000   71.32235146 -156.61224317    10.1243   1  21   0.0042   0.0038 ...
+Both space-separated and comma-separated files are supported, as well as csv files with a plain column line after
+the header block or after a preamble of metadata lines. Date and time are parsed in a single vectorized pass into a Timestamp column.
+
+Long, time-sorted position logs can be read within a time window only: a sidecar index of the epoch time at regular
+byte offsets locates the window by binary search, and only the blocks within the window are parsed.
+"""
+import io
+import logging
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# GPS time is ahead of UTC by 18 leap seconds since 2017-01-01
+GPS_UTC_OFFSET = pd.Timedelta(seconds=18)
+TIME_SYSTEMS = ["GPST", "UTC"]
+# Index of position files, in a hidden directory next to the files
+CACHE_DIRNAME = ".cache"
+INDEX_BLOCK_SIZE = 1 << 16  # 64 KiB
+
+# Columns of the epoch time, as named by read_header or in csv files
+TIME_COLUMNS = ["date", "time", "datetime", "Timestamp", "timestamp"]
+
+# Fixed column dtypes
+POS_DTYPES = {
+    "latitude(deg)": np.float64,
+    "longitude(deg)": np.float64,
+    "height(m)": np.float64,
+    "x-ecef(m)": np.float64,
+    "y-ecef(m)": np.float64,
+    "z-ecef(m)": np.float64,
+    "Q": np.int8,
+    "ns": np.int16,
+    "sdn(m)": np.float32,
+    "sde(m)": np.float32,
+    "sdu(m)": np.float32,
+    "sdne(m)": np.float32,
+    "sdeu(m)": np.float32,
+    "sdun(m)": np.float32,
+    "sdx(m)": np.float32,
+    "sdy(m)": np.float32,
+    "sdz(m)": np.float32,
+    "sdxy(m)": np.float32,
+    "sdyz(m)": np.float32,
+    "sdzx(m)": np.float32,
+    "age(s)": np.float32,
+    "ratio": np.float32,
+}
+
+# Column names used by the SALVO scripts, matching the magnaprobe columns
+POS_COLUMNS = {
+    "latitude(deg)": "Latitude",
+    "longitude(deg)": "Longitude",
+    "height(m)": "Altitude",
+    "Q": "Quality",
+    "ns": "NSatellite",
+    "sdn(m)": "SdN",
+    "sde(m)": "SdE",
+    "sdu(m)": "SdU",
+    "sdne(m)": "SdNE",
+    "sdeu(m)": "SdEU",
+    "sdun(m)": "SdUN",
+    "age(s)": "age",
+    "ratio": "ratio",
+}
+# Column names of the PPK products (a2 and later), matching the magnaprobe quality columns
+PPK_COLUMNS = {
+    **POS_COLUMNS,
+    "Q": "QualityFix",
+    "age(s)": "Age",
+    "ratio": "Ratio",
+}
+
+
+def _split(line, sep):
+    """
+    Split a line on commas, or on whitespaces if sep is None
+    """
+    if sep == ",":
+        return [token.strip() for token in line.split(",")]
+    return line.split()
+
+
+def read_header(fileobj):
+    """
+    Read the header block of a position file
+    :param fileobj: file-like object
+        Position file opened in text mode. If seekable, it is left positioned at the first data line
+    :return header: dict
+        Dictionary with keys:
+            comments: list of the header lines, and of the preamble lines before a plain column line
+            columns: list of the column names of the data lines, with the date and time columns named 'date' and
+                'time', or 'datetime' if date and time are a single column
+            sep: ',' or None for whitespaces
+            time_system: 'GPST', 'UTC' or None
+            first_line: first data line, already read if fileobj is not seekable, otherwise None
+    """
+    seekable = fileobj.seekable()
+    comments = []
+    offset = fileobj.tell() if seekable else None
+    line = fileobj.readline()
+    while line.startswith("%"):
+        comments.append(line.rstrip("\r\n"))
+        offset = fileobj.tell() if seekable else None
+        line = fileobj.readline()
+    # Plain lines before the first data line: preamble lines, then the column line
+    plain = []
+    while line and not line.lstrip()[:1].isdigit():
+        if line.strip():
+            plain.append(line.rstrip("\r\n"))
+        offset = fileobj.tell() if seekable else None
+        line = fileobj.readline()
+    first_line = line.rstrip("\r\n")
+
+    if plain:
+        column_line = plain[-1]
+        comments.extend(plain[:-1])
+    elif comments:
+        column_line = comments[-1].lstrip("%")
+    else:
+        raise ValueError("Position file without column header")
+
+    sep = "," if "," in column_line else None
+    tokens = [token for token in _split(column_line, sep) if token]
+    time_system = tokens[0] if tokens and tokens[0] in TIME_SYSTEMS else None
+    n_fields = len(_split(first_line, sep)) if first_line else len(tokens) + 1
+    if time_system is not None:
+        if n_fields == len(tokens) + 1:
+            columns = ["date", "time"] + tokens[1:]
+        else:
+            columns = ["datetime"] + tokens[1:]
+    else:
+        columns = tokens
+    if seekable:
+        fileobj.seek(offset)
+        first_line = None
+    return {
+        "comments": comments,
+        "columns": columns,
+        "sep": sep,
+        "time_system": time_system,
+        "first_line": first_line,
+    }
+
+
+def _datetime_format(sample):
+    """
+    Return the strptime format of a date and time string, e.g. '2024/05/25 19:47:00.000'
+    """
+    date_sep = "/" if "/" in sample else "-"
+    fmt = "%Y" + date_sep + "%m" + date_sep + "%d %H:%M:%S"
+    if "." in sample.split()[-1]:
+        fmt += ".%f"
+    return fmt
+
+
+def read_pos(source, utc=True, rename=True, usecols=None):
+    """
+    Read an Emlid Studio / RTKLIB position file into a typed dataframe
+    :param source: string or file-like object
+        Position filepath, or file-like object in text or binary mode (e.g. a zip-archive member)
+    :param utc: boolean, default True
+        If True, convert GPS time to UTC
+    :param rename: boolean or dict, default True
+        If True, rename the columns with POS_COLUMNS; if a dictionary, rename the columns with it
+    :param usecols: list of string, optional
+        Original name of the columns to read, besides date and time, e.g. ['latitude(deg)', 'longitude(deg)']
+    :return pos_df: pd.DataFrame()
+        Dataframe with a Timestamp column (datetime64) followed by the data columns. The time system of Timestamp
+        is stored in pos_df.attrs['time_system']
+    """
+    if isinstance(source, str):
+        with open(source, "r", encoding="UTF-8") as f:
+            return read_pos(f, utc=utc, rename=rename, usecols=usecols)
+    if not isinstance(source, io.TextIOBase):
+        source = io.TextIOWrapper(source, encoding="UTF-8")
+
+    header = read_header(source)
+
+    # Data lines, with the first data line already read if the file is not seekable
+    data = source
+    if header["first_line"]:
+        data = io.StringIO(header["first_line"] + "\n" + source.read())
+    return _parse_data(data, header, utc=utc, rename=rename, usecols=usecols)
+
+
+def iter_pos(source, chunksize=100_000, utc=True, rename=True, usecols=None):
+    """
+    Read an Emlid Studio / RTKLIB position file in chunks of rows, see read_pos
+    :param source: string or file-like object
+        Position filepath, or file-like object in text or binary mode (e.g. a zip-archive member)
+    :param chunksize: int
+        Number of rows of each chunk
+    :param utc: boolean, default True
+        If True, convert GPS time to UTC
+    :param rename: boolean or dict, default True
+        If True, rename the columns with POS_COLUMNS; if a dictionary, rename the columns with it
+    :param usecols: list of string, optional
+        Original name of the columns to read, besides date and time
+    :return: generator of pd.DataFrame()
+    """
+    if isinstance(source, str):
+        with open(source, "r", encoding="UTF-8") as f:
+            yield from iter_pos(f, chunksize, utc=utc, rename=rename, usecols=usecols)
+        return
+    if not isinstance(source, io.TextIOBase):
+        source = io.TextIOWrapper(source, encoding="UTF-8")
+
+    header = read_header(source)
+    if header["first_line"]:
+        yield _parse_data(
+            io.StringIO(header["first_line"]), header, utc, rename, usecols
+        )
+    with _read_csv(source, header, usecols=usecols, chunksize=chunksize) as reader:
+        for pos_df in reader:
+            yield _format_data(pos_df, header, utc=utc, rename=rename)
+
+
+def _parse_data(data, header, utc=True, rename=True, usecols=None):
+    """
+    Parse the data lines of a position file, see read_pos
+    :param data: file-like object
+        Data lines, in text mode
+    :param header: dict
+        Header, as returned by read_header
+    """
+    pos_df = _read_csv(data, header, usecols=usecols)
+    return _format_data(pos_df, header, utc=utc, rename=rename)
+
+
+def _read_csv(data, header, usecols=None, chunksize=None):
+    """
+    Read the data lines of a position file with fixed dtypes, in chunks if chunksize is given
+    """
+    columns = header["columns"]
+    time_columns = [c for c in columns if c in TIME_COLUMNS]
+    if usecols is not None:
+        usecols = time_columns + [c for c in columns if c in usecols]
+    dtype = {c: POS_DTYPES[c] for c in columns if c in POS_DTYPES}
+    dtype.update({c: str for c in time_columns})
+    return pd.read_csv(
+        data,
+        sep=r"\s+" if header["sep"] is None else ",",
+        header=None,
+        names=columns,
+        usecols=usecols,
+        dtype=dtype,
+        skipinitialspace=True,
+        comment="%",
+        chunksize=chunksize,
+    )
+
+
+def _format_data(pos_df, header, utc=True, rename=True):
+    """
+    Build the Timestamp column of the data lines of a position file and rename the columns
+    """
+    # Parse date and time in a single pass
+    if "date" in pos_df.columns:
+        datetime = pos_df.pop("date") + " " + pos_df.pop("time")
+    elif "datetime" in pos_df.columns:
+        datetime = pos_df.pop("datetime")
+    else:
+        datetime = None
+        for column in ["Timestamp", "timestamp"]:
+            if column in pos_df.columns:
+                datetime = pos_df.pop(column)
+                break
+    if datetime is not None:
+        if header["time_system"] is None or not len(datetime):
+            timestamp = pd.to_datetime(datetime, format="ISO8601")
+        else:
+            timestamp = pd.to_datetime(
+                datetime, format=_datetime_format(datetime.iloc[0])
+            )
+        pos_df.insert(0, "Timestamp", timestamp)
+
+    time_system = header["time_system"]
+    if utc and time_system == "GPST":
+        pos_df["Timestamp"] = pos_df["Timestamp"] - GPS_UTC_OFFSET
+        time_system = "UTC"
+    pos_df.attrs["time_system"] = time_system
+
+    if rename is True:
+        rename = POS_COLUMNS
+    if rename:
+        pos_df = pos_df.rename(columns=rename)
+    return pos_df
+
+
+def _data_offset(fp):
+    """
+    Return the header and the byte offset of the first data line of a position file
+    """
+    with open(fp, "rb") as f:
+        text = io.TextIOWrapper(f, encoding="UTF-8")
+        header = read_header(text)
+        # At a line start, the position of the text stream is the byte offset
+        return header, text.tell()
+
+
+def _line_epoch(buffer, pos, time_indices, sep):
+    """
+    Return the epoch time, as int64 ns, of the line starting at pos, or None for an empty or comment line
+    """
+    eol = buffer.find(b"\n", pos)
+    line = bytes(buffer[pos : eol if eol != -1 else len(buffer)]).decode("UTF-8")
+    if not line.strip() or line.startswith("%"):
+        return None
+    fields = _split(line.strip(), sep)
+    return pd.Timestamp(" ".join(fields[ii] for ii in time_indices)).value
+
+
+def _build_index(buffer, header, data_offset, block_size):
+    """
+    Return the offset and epoch time of the first data line after each block boundary
+    """
+    time_indices = [
+        ii for ii, column in enumerate(header["columns"]) if column in TIME_COLUMNS
+    ]
+    offsets, epochs = [], []
+    pos = data_offset
+    while 0 <= pos < len(buffer):
+        epoch = _line_epoch(buffer, pos, time_indices, header["sep"])
+        if epoch is not None:
+            offsets.append(pos)
+            epochs.append(epoch)
+            # Jump to the first line starting after the block boundary
+            eol = buffer.find(b"\n", pos + block_size - 1)
+        else:
+            # Skip empty and comment lines
+            eol = buffer.find(b"\n", pos)
+        pos = eol + 1 if eol != -1 else -1
+    return np.array([offsets, epochs], dtype=np.int64).T.reshape(-1, 2)
+
+
+def read_index(fp, block_size=INDEX_BLOCK_SIZE):
+    """
+    Return the epoch index of a position file, mapping the epoch time of the first data line of each block of
+    block_size bytes to its byte offset. The index is stored in a sidecar .npz file, in the CACHE_DIRNAME directory
+    next to the position file, and rebuilt when the position file changes. Building the index reads one line per block.
+    :param fp: string
+        Position filepath
+    :param block_size: int
+        Size of the blocks in bytes
+    :return header, index: dict, ndarray
+        Header, as returned by read_header, and int64 array of shape (n, 2) with the byte offset and the epoch time (in
+        ns since 1970-01-01, in the time system of the file) of each indexed line
+    """
+    fp = os.path.abspath(fp)
+    stat = os.stat(fp)
+    index_fp = os.path.join(
+        os.path.dirname(fp), CACHE_DIRNAME, os.path.basename(fp) + ".idx.npz"
+    )
+    header, data_offset = _data_offset(fp)
+    # Size and modification time of the indexed file, and block size
+    signature = np.array([stat.st_size, stat.st_mtime_ns, block_size], dtype=np.int64)
+    if os.path.exists(index_fp):
+        with np.load(index_fp) as npz:
+            if np.array_equal(npz["signature"], signature):
+                return header, npz["index"]
+
+    with open(fp, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            buffer = b""
+        try:
+            index = _build_index(buffer, header, data_offset, block_size)
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+    os.makedirs(os.path.dirname(index_fp), exist_ok=True)
+    np.savez(index_fp, index=index, signature=signature)
+    return header, index
+
+
+def first_epoch(fp, utc=True, block_size=INDEX_BLOCK_SIZE):
+    """
+    Return the epoch time of the first data line of a position file, from its epoch index (see read_index)
+    :param fp: string
+        Position filepath
+    :param utc: boolean, default True
+        If True, return the time in UTC, otherwise in the time system of the file
+    :param block_size: int
+        Size of the index blocks in bytes
+    :return t0: pd.Timestamp or None
+        Epoch time of the first data line, None for a file without data line
+    """
+    header, index = read_index(fp, block_size=block_size)
+    if not len(index):
+        return None
+    t0 = pd.Timestamp(index[0, 1])
+    if utc and header["time_system"] == "GPST":
+        t0 -= GPS_UTC_OFFSET
+    return t0
+
+
+def read_pos_window(
+    fp,
+    start=None,
+    end=None,
+    margin=None,
+    utc=True,
+    rename=True,
+    usecols=None,
+    block_size=INDEX_BLOCK_SIZE,
+):
+    """
+    Read the rows of a time-sorted position file within a time window. The blocks containing the window are found by
+    binary search in the epoch index of the file (see read_index), and only these blocks are parsed.
+    :param fp: string
+        Position filepath
+    :param start: datetime-like, optional
+        Start of the window, in UTC if utc is True, otherwise in the time system of the file. Defaults to the
+        beginning of the file
+    :param end: datetime-like, optional
+        End of the window, included. Defaults to the end of the file
+    :param margin: timedelta-like, optional
+        Margin added before start and after end
+    :param utc: boolean, default True
+        See read_pos
+    :param rename: boolean or dict, default True
+        See read_pos
+    :param usecols: list of string, optional
+        See read_pos
+    :param block_size: int
+        Size of the index blocks in bytes
+    :return pos_df: pd.DataFrame()
+        See read_pos
+    """
+    header, index = read_index(fp, block_size=block_size)
+    margin = pd.Timedelta(margin or 0)
+    # Window in the time system of the file
+    shift = (
+        GPS_UTC_OFFSET if utc and header["time_system"] == "GPST" else pd.Timedelta(0)
+    )
+    start = None if start is None else pd.Timestamp(start) - margin
+    end = None if end is None else pd.Timestamp(end) + margin
+    offsets, epochs = index[:, 0], index[:, 1]
+
+    size = os.path.getsize(fp)
+    lo = offsets[0] if len(offsets) else size
+    if start is not None and len(offsets):
+        # Last block starting at or before start
+        ii = np.searchsorted(epochs, (start + shift).value, side="right") - 1
+        lo = offsets[max(ii, 0)]
+    hi = size
+    if end is not None:
+        # First block starting after end
+        ii = np.searchsorted(epochs, (end + shift).value, side="right")
+        hi = offsets[ii] if ii < len(offsets) else size
+
+    with open(fp, "rb") as f:
+        f.seek(lo)
+        data = f.read(max(hi - lo, 0)).decode("UTF-8")
+    pos_df = _parse_data(
+        io.StringIO(data), header, utc=utc, rename=rename, usecols=usecols
+    )
+    mask = np.ones(len(pos_df), dtype=bool)
+    if start is not None:
+        mask &= (pos_df["Timestamp"] >= start).to_numpy()
+    if end is not None:
+        mask &= (pos_df["Timestamp"] <= end).to_numpy()
+    if not mask.all():
+        pos_df = pos_df.loc[mask].reset_index(drop=True)
+    return pos_df
@@ -0,0 +1,272 @@
+"""
+Scanner for RINEX 3 observation files (e.g. emlid .24O files), to get the epoch times, sampling interval and time span
+without loading the file in memory.
+
+Files are memory-mapped, and file-like objects such as zip-archive members are streamed in chunks. The header is parsed for INTERVAL, TIME OF FIRST OBS and TIME OF LAST OBS, then the scanner
+jumps from one epoch record, starting with '>', to the next one without splitting the observation lines.
+Epoch times are returned as int64 nanoseconds since 1970-01-01, in the time system of the file (GPS time for emlid).
+"""
+import contextlib
+import logging
+import mmap
+
+import numpy as np
+
+from salvo.file.archive import CHUNK_SIZE, iter_chunks
+
+logger = logging.getLogger(__name__)
+
+NS = 1_000_000_000
+
+
+def _days_from_civil(year, month, day):
+    """
+    Return the number of days since 1970-01-01 of a date of the proleptic Gregorian calendar. Works on arrays.
+    """
+    year = np.asarray(year, dtype=np.int64) - (np.asarray(month) <= 2)
+    era = np.floor_divide(year, 400)
+    yoe = year - era * 400
+    month = np.asarray(month, dtype=np.int64)
+    doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + np.asarray(day) - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _epoch_ns(fields):
+    """
+    Convert epoch fields [year, month, day, hour, minute, second] to int64 nanoseconds since 1970-01-01
+    :param fields: array_like
+        Array of shape (..., 6). Seconds may be fractional
+    :return: ndarray, int64
+    """
+    fields = np.asarray(fields, dtype=float)
+    days = _days_from_civil(
+        fields[..., 0].astype(np.int64),
+        fields[..., 1].astype(np.int64),
+        fields[..., 2].astype(np.int64),
+    )
+    seconds = (
+        days * 86400
+        + fields[..., 3].astype(np.int64) * 3600
+        + fields[..., 4].astype(np.int64) * 60
+    )
+    return seconds * NS + np.round(fields[..., 5] * NS).astype(np.int64)
+
+
+def _parse_header(buffer):
+    """
+    Parse the header of a RINEX observation file from a buffer
+    """
+    header = {
+        "version": None,
+        "interval": None,
+        "time_first_obs": None,
+        "time_last_obs": None,
+        "end_of_header": None,
+    }
+    pos = 0
+    size = len(buffer)
+    while pos < size:
+        eol = buffer.find(b"\n", pos)
+        if eol == -1:
+            eol = size
+        line = bytes(buffer[pos:eol]).rstrip(b"\r")
+        label = line[60:].strip()
+        pos = eol + 1
+        if label == b"RINEX VERSION / TYPE":
+            header["version"] = float(line[:9])
+        elif label == b"INTERVAL":
+            header["interval"] = float(line[:10])
+        elif label == b"TIME OF FIRST OBS":
+            header["time_first_obs"] = int(_epoch_ns(line[:43].split()[:6]))
+        elif label == b"TIME OF LAST OBS":
+            header["time_last_obs"] = int(_epoch_ns(line[:43].split()[:6]))
+        elif label == b"END OF HEADER":
+            header["end_of_header"] = pos
+            break
+    if header["end_of_header"] is None:
+        logger.warning("RINEX header: END OF HEADER not found")
+        header["end_of_header"] = 0
+    return header
+
+
+def _read_stream_header(fileobj):
+    """
+    Read and parse the header of a RINEX observation file from a binary file-like object, line by line
+    """
+    lines = []
+    for line in iter(fileobj.readline, b""):
+        lines.append(line)
+        if line[60:].strip() == b"END OF HEADER":
+            break
+    return _parse_header(b"".join(lines))
+
+
+def _buffer_lines(buffer, start=0):
+    """
+    Yield the epoch lines, without the leading '>', of a buffer from the start offset
+    """
+    pos = start if buffer[start : start + 1] == b">" else buffer.find(b"\n>", start) + 1
+    while pos > 0:
+        eol = buffer.find(b"\n", pos)
+        if eol == -1:
+            eol = len(buffer)
+        yield bytes(buffer[pos + 1 : eol])
+        pos = buffer.find(b"\n>", eol) + 1
+
+
+def _stream_lines(fileobj, chunk_size=CHUNK_SIZE):
+    """
+    Yield the epoch lines, without the leading '>', of a binary file-like object read in fixed-size chunks
+    """
+    tail = b"\n"
+    for chunk in iter_chunks(fileobj, chunk_size):
+        data = tail + chunk
+        pos = data.find(b"\n>")
+        while pos != -1:
+            eol = data.find(b"\n", pos + 1)
+            if eol == -1:
+                break
+            yield data[pos + 2 : eol]
+            pos = data.find(b"\n>", eol)
+        # Keep the incomplete epoch line, or the end of the last line
+        tail = data[pos:] if pos != -1 else data[data.rfind(b"\n") :]
+    if tail.startswith(b"\n>"):
+        yield tail[2:]
+
+
+@contextlib.contextmanager
+def _open_source(source):
+    """
+    Open a RINEX observation file and return its header, a generator of its epoch lines and its buffer. Filepaths
+    are memory-mapped, bytes are used as is and file-like objects (e.g. a zip-archive member) are streamed in chunks,
+    without buffer.
+    """
+    if hasattr(source, "read"):
+        yield _read_stream_header(source), _stream_lines(source), None
+        return
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        header = _parse_header(source)
+        yield header, _buffer_lines(source, header["end_of_header"]), source
+        return
+    with open(source, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            buffer = b""
+        try:
+            header = _parse_header(buffer)
+            yield header, _buffer_lines(buffer, header["end_of_header"]), buffer
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+
+def _epoch_fields(lines, max_epochs=None, settle=None):
+    """
+    Yield the fields [year, month, day, hour, minute, second] of the epoch lines
+    """
+    n_epochs = 0
+    n_settled = 0
+    last_ns, last_dt = None, None
+    for line in lines:
+        if max_epochs is not None and n_epochs >= max_epochs:
+            break
+        fields = line.split()[:6]
+        if len(fields) < 6:
+            continue
+        n_epochs += 1
+        yield fields
+
+        if settle:
+            # Stop once the last `settle` intervals are identical
+            epoch_ns = int(_epoch_ns(fields))
+            if last_ns is not None:
+                dt = epoch_ns - last_ns
+                n_settled = n_settled + 1 if dt == last_dt else 0
+                last_dt = dt
+                if n_settled >= settle:
+                    break
+            last_ns = epoch_ns
+
+
+def read_header(source):
+    """
+    Read the header of a RINEX observation file
+    :param source: string, bytes or file-like object
+        RINEX observation filepath, file content or binary file-like object, e.g. a zip-archive member
+    :return header: dict
+        Dictionary with keys version, interval (in s), time_first_obs and time_last_obs (int64 ns since 1970-01-01),
+        and end_of_header (byte offset of the first epoch). Values not found are None
+    """
+    with _open_source(source) as (header, _, _):
+        return header
+
+
+def scan_epochs(source, max_epochs=None, settle=None):
+    """
+    Return the epoch times of a RINEX 3 observation file, jumping from one epoch record to the next
+    :param source: string, bytes or file-like object
+        RINEX observation filepath, file content or binary file-like object, e.g. a zip-archive member
+    :param max_epochs: int, optional
+        Maximal number of epochs to read
+    :param settle: int, optional
+        If given, stop as soon as `settle` consecutive intervals are identical, i.e. once the sampling rate is settled
+    :return epochs: ndarray, int64
+        Epoch times, in nanoseconds since 1970-01-01
+    """
+    with _open_source(source) as (_, lines, _):
+        fields = list(_epoch_fields(lines, max_epochs=max_epochs, settle=settle))
+    if not fields:
+        return np.array([], dtype=np.int64)
+    return _epoch_ns(np.array(fields, dtype=float))
+
+
+def sampling_interval(source, settle=10):
+    """
+    Return the sampling interval of a RINEX observation file, from the header INTERVAL if defined, otherwise from the
+    median interval between epochs
+    :param source: string, bytes or file-like object
+        RINEX observation filepath, file content or binary file-like object, e.g. a zip-archive member
+    :param settle: int or None
+        Stop scanning once `settle` consecutive intervals are identical. If None, scan all epochs
+    :return interval: float or None
+        Sampling interval in s, None if it cannot be determined
+    """
+    with _open_source(source) as (header, lines, _):
+        if header["interval"]:
+            return header["interval"]
+        fields = list(_epoch_fields(lines, settle=settle))
+    if len(fields) < 3:
+        logger.warning("Sampling interval not defined")
+        return None
+    epochs = _epoch_ns(np.array(fields, dtype=float))
+    return float(np.median(np.diff(epochs))) / NS
+
+
+def time_span(source):
+    """
+    Return the time of the first and last observation of a RINEX observation file. The header values are used when
+    defined. Otherwise, only the first and last epoch records of a file are read; streams are read to the end.
+    :param source: string, bytes or file-like object
+        RINEX observation filepath, file content or binary file-like object, e.g. a zip-archive member
+    :return first, last: int, int
+        Time of first and last observation, in nanoseconds since 1970-01-01, None if the file has no epoch
+    """
+    with _open_source(source) as (header, lines, buffer):
+        first, last = header["time_first_obs"], header["time_last_obs"]
+        if first is None or last is None:
+            fields = next(_epoch_fields(lines), None)
+            if fields is None:
+                return first, last
+            first = int(_epoch_ns(fields)) if first is None else first
+        if last is None and buffer is not None:
+            # Jump to the last epoch record
+            pos = buffer.rfind(b"\n>", header["end_of_header"]) + 1
+            fields = next(_epoch_fields(_buffer_lines(buffer, pos)), fields)
+            last = int(_epoch_ns(fields))
+        elif last is None:
+            for fields in _epoch_fields(lines):
+                pass
+            last = int(_epoch_ns(fields))
+    return first, last
@@ -0,0 +1,281 @@
+"""
+Content-addressed store of raw files.
+
+Files are identified by the SHA-256 digest of their content. Each distinct content is kept once under
+<store>/objects/<2 first hex digits>/<digest>, and copies are created as hardlinks or reflinks instead of byte copies.
+A yaml manifest records the digest, size and modification time of each input file, so that unchanged inputs are
+neither hashed nor processed twice.
+
+Example:
+    store = RawStore("/mnt/data/UAF-data/raw/SALVO/.store")
+    store.add(zip_fps)
+    store.link(zip_fp, backup_fp)
+    store.save()
+"""
+import concurrent.futures
+import hashlib
+import logging
+import os
+import shutil
+import threading
+
+import yaml
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+FICLONE = 0x40049409  # Linux ioctl to clone a file (reflink) on btrfs, xfs, ...
+MANIFEST_FN = "manifest.yaml"
+
+
+def sha256(fp, chunk_size=CHUNK_SIZE):
+    """
+    Compute the SHA-256 digest of a file, reading it in chunks in a reusable buffer
+    :param fp: string
+        Filepath
+    :param chunk_size: int
+        Size of the chunks in bytes
+    :return digest: string
+        Hexadecimal digest
+    """
+    h = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(fp, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def hash_files(fps, workers=4, chunk_size=CHUNK_SIZE):
+    """
+    Compute the SHA-256 digest of many files in a thread pool. hashlib releases the GIL on large buffers, so that
+    reading a file overlaps with hashing the others.
+    :param fps: list of string
+        Filepaths
+    :param workers: int
+        Number of threads
+    :param chunk_size: int
+        Size of the chunks in bytes
+    :return: dict
+        Dictionary with filepath as key and hexadecimal digest as value
+    """
+    fps = list(fps)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = executor.map(lambda fp: sha256(fp, chunk_size), fps)
+        return dict(zip(fps, digests))
+
+
+def _reflink(src, dst):
+    """
+    Clone src to dst with copy-on-write, if supported by the file system
+    :param src: string
+        Source filepath
+    :param dst: string
+        New filepath, e.g. a temporary file. It is never an existing file, which would be truncated
+    :return: boolean
+        True if the file was cloned
+    """
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as f_src, open(dst, "xb") as f_dst:
+            fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+    except FileExistsError:
+        return False
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+    return True
+
+
+def _tmp_path(dst):
+    """
+    Return a temporary filepath in the directory of dst, unique to the process and thread
+    """
+    head, tail = os.path.split(dst)
+    return os.path.join(
+        head, "." + tail + "." + str(os.getpid()) + "." + str(threading.get_ident())
+    )
+
+
+def link_file(src, dst, hardlink=True, replace=True):
+    """
+    Create dst with the content of src without copying bytes when possible: hardlink, then reflink, then copy. The
+    content is first created in a temporary file next to dst, then moved onto dst, so that an existing dst is never
+    truncated or left partially written.
+    :param src: string
+        Source filepath
+    :param dst: string
+        Target filepath. Its directory is created if it does not exist
+    :param hardlink: boolean, default True
+        If False, do not hardlink, e.g. for working files modified in place, which would modify src as well
+    :param replace: boolean, default True
+        If False, keep an existing dst and raise FileExistsError, e.g. for a store object created concurrently by
+        another process
+    :return method: string
+        'hardlink', 'reflink' or 'copy'
+    """
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    if not replace and os.path.exists(dst):
+        raise FileExistsError(dst)
+    tmp_fp = _tmp_path(dst)
+    if os.path.exists(tmp_fp):
+        os.remove(tmp_fp)
+    try:
+        method = None
+        if hardlink:
+            try:
+                os.link(src, tmp_fp)
+                method = "hardlink"
+            except OSError:
+                pass
+        if method is None and _reflink(src, tmp_fp):
+            method = "reflink"
+        if method is None:
+            shutil.copy2(src, tmp_fp)
+            method = "copy"
+        if replace:
+            os.replace(tmp_fp, dst)
+        else:
+            try:
+                # Fails with FileExistsError if dst was created in the meantime
+                os.link(tmp_fp, dst)
+            except FileExistsError:
+                raise
+            except OSError:
+                # No hardlink support
+                if os.path.exists(dst):
+                    raise FileExistsError(dst)
+                os.replace(tmp_fp, dst)
+    finally:
+        # Left over after an error, after os.link, or after os.replace of a hardlink onto the same file
+        if os.path.exists(tmp_fp):
+            os.remove(tmp_fp)
+    return method
+
+
+class RawStore:
+    """
+    Content-addressed store of raw files, with a manifest of the input files
+    """
+
+    def __init__(self, store_dir, workers=4):
+        """
+        :param store_dir: string
+            Directory of the store. It should be on the same file system as the raw files, to allow hardlinks
+        :param workers: int
+            Number of threads used to hash files
+        """
+        self.store_dir = store_dir
+        self.workers = workers
+        self.manifest_fp = os.path.join(store_dir, MANIFEST_FN)
+        self.manifest = {}
+        self._updated = {}
+        if os.path.exists(self.manifest_fp):
+            with open(self.manifest_fp, "r", encoding="UTF-8") as f:
+                self.manifest = yaml.safe_load(f) or {}
+
+    def object_path(self, digest):
+        """
+        Return the path of the stored object of a digest
+        """
+        return os.path.join(self.store_dir, "objects", digest[:2], digest)
+
+    def unchanged(self, fp):
+        """
+        Return True if the file has the size and modification time recorded in the manifest
+        :param fp: string
+            Filepath
+        :return: boolean
+        """
+        record = self.manifest.get(os.path.abspath(fp))
+        if record is None or not os.path.exists(fp):
+            return False
+        stat = os.stat(fp)
+        return record["size"] == stat.st_size and record["mtime"] == stat.st_mtime_ns
+
+    def digest(self, fp):
+        """
+        Return the digest of a file recorded in the manifest, or None if the file is unknown or changed
+        """
+        if self.unchanged(fp):
+            return self.manifest[os.path.abspath(fp)]["sha256"]
+        return None
+
+    def add(self, fps):
+        """
+        Add files to the store. Only new or changed files are hashed, in a thread pool. Content not yet in the store
+        is hardlinked, or copied, into it.
+        :param fps: list of string
+            Filepaths
+        :return: dict
+            Dictionary with filepath as key and hexadecimal digest as value
+        """
+        fps = [fps] if isinstance(fps, str) else list(fps)
+        digests = {fp: self.digest(fp) for fp in fps}
+        changed = [fp for fp, digest in digests.items() if digest is None]
+        if changed:
+            logger.info("Hashing %d files", len(changed))
+            digests.update(hash_files(changed, workers=self.workers))
+        for fp in changed:
+            obj_fp = self.object_path(digests[fp])
+            try:
+                link_file(fp, obj_fp, replace=False)
+            except FileExistsError:
+                # Already stored, e.g. by another process sharing the store
+                logger.info(str("Duplicate content: " + fp))
+            stat = os.stat(fp)
+            record = {
+                "sha256": digests[fp],
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+            }
+            self.manifest[os.path.abspath(fp)] = record
+            self._updated[os.path.abspath(fp)] = record
+        return digests
+
+    def link(self, fp, dst, hardlink=True):
+        """
+        Create dst with the content of a stored file without copying bytes when possible
+        :param fp: string
+            Filepath of a file added to the store
+        :param dst: string
+            Target filepath
+        :param hardlink: boolean, default True
+            If False, reflink or copy only, e.g. for working files modified in place
+        :return method: string
+            'hardlink', 'reflink' or 'copy'
+        """
+        digest = self.digest(fp) or self.add(fp)[fp]
+        return link_file(self.object_path(digest), dst, hardlink=hardlink)
+
+    def save(self):
+        """
+        Write the manifest to the store directory. The records added since loading are merged into the manifest on
+        disk under a file lock, so that several processes can share the store.
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(self.manifest_fp + ".lock", "w", encoding="UTF-8") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            manifest = {}
+            if os.path.exists(self.manifest_fp):
+                with open(self.manifest_fp, "r", encoding="UTF-8") as f:
+                    manifest = yaml.safe_load(f) or {}
+            manifest.update(self._updated)
+            tmp_fp = self.manifest_fp + "." + str(os.getpid())
+            with open(tmp_fp, "w", encoding="UTF-8") as f:
+                yaml.safe_dump(manifest, f)
+            os.replace(tmp_fp, self.manifest_fp)
+        self.manifest = manifest
+        self._updated = {}
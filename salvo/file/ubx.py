@@ -0,0 +1,355 @@
+"""
+Scanner for u-blox UBX binary logs (e.g. emlid raw .UBX files), to get the epoch times, sampling interval, fix type
+and satellite counts without converting the log to RINEX.
+
+The log is streamed in chunks. Each frame starts with the sync bytes 0xB5 0x62, followed by the message class, id,
+payload length, payload and a 2-byte Fletcher checksum. Frames with an invalid checksum are skipped, and the scanner
+resynchronizes on the next sync bytes. NAV-PVT and RXM-RAWX payloads are collected, then decoded at once into typed
+arrays with numpy structured dtypes.
+Epoch times are returned as int64 nanoseconds since 1970-01-01: in UTC for NAV-PVT and in GPS time for RXM-RAWX, as
+for RINEX observation files.
+"""
+import contextlib
+import itertools
+import logging
+
+import numpy as np
+import pandas as pd
+
+from salvo.file.archive import CHUNK_SIZE, iter_chunks
+
+logger = logging.getLogger(__name__)
+
+NS = 1_000_000_000
+SYNC = b"\xb5\x62"
+HEADER_SIZE = 6  # sync bytes, class, id and payload length
+CHECKSUM_SIZE = 2
+GPS_EPOCH = 315964800  # 1980-01-06, in s since 1970-01-01
+WEEK = 604800  # s
+
+# (class, id) of the decoded messages
+NAV_PVT = (0x01, 0x07)
+RXM_RAWX = (0x02, 0x15)
+
+# Fields of the NAV-PVT payload: name, format and offset
+NAV_PVT_FIELDS = [
+    ("itow", "<u4", 0),
+    ("year", "<u2", 4),
+    ("month", "u1", 6),
+    ("day", "u1", 7),
+    ("hour", "u1", 8),
+    ("min", "u1", 9),
+    ("sec", "u1", 10),
+    ("valid", "u1", 11),
+    ("t_acc", "<u4", 12),
+    ("nano", "<i4", 16),
+    ("fix_type", "u1", 20),
+    ("flags", "u1", 21),
+    ("num_sv", "u1", 23),
+    ("lon", "<i4", 24),
+    ("lat", "<i4", 28),
+    ("height", "<i4", 32),
+    ("h_msl", "<i4", 36),
+    ("h_acc", "<u4", 40),
+    ("v_acc", "<u4", 44),
+]
+NAV_PVT_DTYPE = np.dtype(
+    {
+        "names": [name for name, _, _ in NAV_PVT_FIELDS],
+        "formats": [fmt for _, fmt, _ in NAV_PVT_FIELDS],
+        "offsets": [offset for _, _, offset in NAV_PVT_FIELDS],
+        "itemsize": 92,
+    }
+)
+RAWX_HEADER_DTYPE = np.dtype(
+    {
+        "names": ["rcv_tow", "week", "leap_s", "num_meas", "rec_stat"],
+        "formats": ["<f8", "<u2", "i1", "u1", "u1"],
+        "offsets": [0, 8, 10, 11, 12],
+        "itemsize": 16,
+    }
+)
+RAWX_MEAS_DTYPE = np.dtype(
+    {
+        "names": ["gnss_id", "sv_id"],
+        "formats": ["u1", "u1"],
+        "offsets": [20, 21],
+        "itemsize": 32,
+    }
+)
+
+# Typed arrays returned by scan_ubx
+PVT_DTYPE = np.dtype(
+    [
+        ("time", "<i8"),
+        ("valid", "?"),
+        ("fix_type", "u1"),
+        ("num_sv", "u1"),
+        ("latitude", "<f8"),
+        ("longitude", "<f8"),
+        ("height", "<f8"),
+        ("h_acc", "<f4"),
+        ("v_acc", "<f4"),
+    ]
+)
+RAWX_DTYPE = np.dtype(
+    [("time", "<i8"), ("leap_s", "i1"), ("num_meas", "u1"), ("num_sv", "u1")]
+)
+
+
+def _frame_bounds(buffer, pos, eof):
+    """
+    Return the candidate frames of a buffer, jumping from one frame to the next with the payload length, and the
+    offset where the scan stopped
+    :return starts, ends, pos: list, list, int
+        Start offset of the sync bytes and end offset of the checksum of each candidate frame
+    """
+    starts, ends = [], []
+    size = len(buffer)
+    while True:
+        if buffer[pos : pos + 2] != SYNC:
+            pos = buffer.find(SYNC, pos)
+            if pos == -1:
+                # Keep a trailing sync byte, which may be completed by the next chunk
+                pos = size - 1 if buffer.endswith(SYNC[:1]) and not eof else size
+                break
+        if pos + HEADER_SIZE > size:
+            break
+        end = pos + HEADER_SIZE + (buffer[pos + 4] | buffer[pos + 5] << 8) + 2
+        if end > size:
+            if eof:
+                # Truncated frame, or a false sync
+                pos += 1
+                continue
+            break
+        starts.append(pos)
+        ends.append(end)
+        pos = end
+    return starts, ends, pos
+
+
+def _running_sums(buffer):
+    """
+    Return the bytes of a buffer, their cumulative sum and the cumulative sum of the bytes weighted by their offset,
+    from which the checksums of all the frames of the buffer are computed
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    sum_b = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum(data, out=sum_b[1:])
+    sum_gb = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum(data * np.arange(len(data), dtype=np.int64), out=sum_gb[1:])
+    return data, sum_b, sum_gb
+
+
+def _checksum_errors(sums, starts, ends):
+    """
+    Return the candidate frames with an invalid 8-bit Fletcher checksum, computed at once for all frames
+    """
+    data, sum_b, sum_gb = sums
+    # ck_a sums the bytes from class to payload, ck_b sums the running values of ck_a, i.e. each byte weighted by its
+    # distance to the checksum
+    first = np.asarray(starts, dtype=np.int64) + 2
+    last = np.asarray(ends, dtype=np.int64) - 2
+    ck_a = (sum_b[last] - sum_b[first]) & 0xFF
+    ck_b = (last * (sum_b[last] - sum_b[first]) - (sum_gb[last] - sum_gb[first])) & 0xFF
+    return np.flatnonzero((ck_a != data[last]) | (ck_b != data[last + 1]))
+
+
+def iter_frames(fileobj, chunk_size=CHUNK_SIZE, messages=None):
+    """
+    Yield the valid frames of a UBX stream
+    :param fileobj: file-like object
+        Binary file-like object, e.g. an opened file or a zip-archive member
+    :param chunk_size: int
+        Size of the chunks in bytes
+    :param messages: list of tuple, optional
+        (class, id) of the messages to yield. Defaults to all messages; checksums of all frames are verified anyway
+    :return: generator of (msg_class, msg_id, payload)
+    """
+    n_frames, n_errors = 0, 0
+    buffer = b""
+    # The final None marks the end of the stream
+    for chunk in itertools.chain(iter_chunks(fileobj, chunk_size), [None]):
+        eof = chunk is None
+        if not eof:
+            buffer += chunk
+        sums = _running_sums(buffer)
+        pos = 0
+        while True:
+            starts, ends, stop = _frame_bounds(buffer, pos, eof)
+            errors = _checksum_errors(sums, starts, ends) if starts else []
+            n_valid = errors[0] if len(errors) else len(starts)
+            for start, end in zip(starts[:n_valid], ends[:n_valid]):
+                message = (buffer[start + 2], buffer[start + 3])
+                if messages is None or message in messages:
+                    yield message[0], message[1], buffer[start + HEADER_SIZE : end - 2]
+            n_frames += n_valid
+            if not len(errors):
+                pos = stop
+                break
+            # Not a frame, or a corrupted one: resynchronize after its sync bytes
+            n_errors += 1
+            pos = starts[n_valid] + 1
+        buffer = buffer[pos:]
+    if n_errors:
+        logger.warning("UBX stream: %d invalid frames skipped", n_errors)
+    logger.info("UBX stream: %d valid frames", n_frames)
+
+
+def _decode_pvt(payloads):
+    """
+    Decode NAV-PVT payloads into a PVT_DTYPE array
+    """
+    raw = np.frombuffer(b"".join(payloads), dtype=NAV_PVT_DTYPE)
+    months = (raw["year"].astype(np.int64) - 1970) * 12 + raw["month"] - 1
+    days = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    seconds = (
+        (days + raw["day"] - 1) * 86400
+        + raw["hour"].astype(np.int64) * 3600
+        + raw["min"].astype(np.int64) * 60
+        + raw["sec"]
+    )
+    pvt = np.empty(len(raw), dtype=PVT_DTYPE)
+    pvt["time"] = seconds * NS + raw["nano"]
+    # validDate and validTime flags
+    pvt["valid"] = (raw["valid"] & 0x03) == 0x03
+    pvt["fix_type"] = raw["fix_type"]
+    pvt["num_sv"] = raw["num_sv"]
+    pvt["latitude"] = raw["lat"] * 1e-7
+    pvt["longitude"] = raw["lon"] * 1e-7
+    pvt["height"] = raw["height"] * 1e-3
+    pvt["h_acc"] = raw["h_acc"] * 1e-3
+    pvt["v_acc"] = raw["v_acc"] * 1e-3
+    return pvt
+
+
+def _decode_rawx(payloads):
+    """
+    Decode RXM-RAWX payloads into a RAWX_DTYPE array
+    """
+    header = np.frombuffer(
+        b"".join(payload[: RAWX_HEADER_DTYPE.itemsize] for payload in payloads),
+        dtype=RAWX_HEADER_DTYPE,
+    )
+    meas = np.frombuffer(
+        b"".join(payload[RAWX_HEADER_DTYPE.itemsize :] for payload in payloads),
+        dtype=RAWX_MEAS_DTYPE,
+    )
+    rawx = np.empty(len(header), dtype=RAWX_DTYPE)
+    seconds = GPS_EPOCH + header["week"].astype(np.int64) * WEEK
+    rawx["time"] = seconds * NS + np.round(header["rcv_tow"] * NS).astype(np.int64)
+    rawx["leap_s"] = header["leap_s"]
+    rawx["num_meas"] = header["num_meas"]
+    # Count the distinct satellites of each epoch, a satellite having one measurement per signal
+    epoch = np.repeat(np.arange(len(header), dtype=np.int64), header["num_meas"])
+    keys = np.sort(
+        epoch << 16
+        | meas["gnss_id"].astype(np.int64) << 8
+        | meas["sv_id"].astype(np.int64)
+    )
+    distinct = np.ones(len(keys), dtype=bool)
+    distinct[1:] = keys[1:] != keys[:-1]
+    rawx["num_sv"] = np.bincount(keys[distinct] >> 16, minlength=len(header))
+    return rawx
+
+
+def _valid_payload(message, payload):
+    """
+    Return True if the payload length matches the decoded layout: 92 bytes for NAV-PVT, a 16-byte header followed by
+    32 bytes per measurement for RXM-RAWX. Other lengths, e.g. 84-byte NAV-PVT of older protocol versions, are skipped
+    """
+    if message == NAV_PVT:
+        return len(payload) == NAV_PVT_DTYPE.itemsize
+    header_size = RAWX_HEADER_DTYPE.itemsize
+    if len(payload) < header_size:
+        return False
+    num_meas = payload[11]
+    return len(payload) == header_size + RAWX_MEAS_DTYPE.itemsize * num_meas
+
+
+@contextlib.contextmanager
+def _open_source(source):
+    """
+    Open a UBX log as a binary file-like object. Filepaths are opened, file-like objects (e.g. a zip-archive member)
+    are used as is.
+    """
+    if hasattr(source, "read"):
+        yield source
+        return
+    with open(source, "rb") as f:
+        yield f
+
+
+def scan_ubx(source, chunk_size=CHUNK_SIZE):
+    """
+    Scan a UBX log for NAV-PVT and RXM-RAWX messages, in a single pass
+    :param source: string or file-like object
+        UBX filepath or binary file-like object, e.g. a zip-archive member
+    :param chunk_size: int
+        Size of the chunks in bytes
+    :return pvt, rawx: ndarray, ndarray
+        NAV-PVT solutions as a PVT_DTYPE array (time in UTC, fix type, number of satellites used, position and
+        accuracy), and RXM-RAWX epochs as a RAWX_DTYPE array (time in GPS time, leap seconds, number of measurements
+        and of satellites)
+    """
+    payloads = {NAV_PVT: [], RXM_RAWX: []}
+    n_skipped = 0
+    with _open_source(source) as f:
+        for msg_class, msg_id, payload in iter_frames(
+            f, chunk_size, messages=list(payloads)
+        ):
+            if not _valid_payload((msg_class, msg_id), payload):
+                n_skipped += 1
+                continue
+            payloads[(msg_class, msg_id)].append(payload)
+    if n_skipped:
+        logger.warning(
+            "UBX stream: %d messages with unexpected payload length skipped", n_skipped
+        )
+    return _decode_pvt(payloads[NAV_PVT]), _decode_rawx(payloads[RXM_RAWX])
+
+
+def sampling_interval(source, chunk_size=CHUNK_SIZE):
+    """
+    Return the sampling interval of a UBX log, from the median interval between RXM-RAWX epochs, or between NAV-PVT
+    solutions if the log has no raw measurements
+    :param source: string or file-like object
+        UBX filepath or binary file-like object, e.g. a zip-archive member
+    :param chunk_size: int
+        Size of the chunks in bytes
+    :return interval: float or None
+        Sampling interval in s, None if it cannot be determined
+    """
+    pvt, rawx = scan_ubx(source, chunk_size)
+    epochs = rawx["time"] if len(rawx) >= 3 else pvt["time"][pvt["valid"]]
+    if len(epochs) < 3:
+        logger.warning("Sampling interval not defined")
+        return None
+    return float(np.median(np.diff(epochs))) / NS
+
+
+def read_track(source, chunk_size=CHUNK_SIZE):
+    """
+    Return the NAV-PVT solutions of a UBX log as a quick-look track
+    :param source: string or file-like object
+        UBX filepath or binary file-like object, e.g. a zip-archive member
+    :param chunk_size: int
+        Size of the chunks in bytes
+    :return track_df: pd.DataFrame()
+        Dataframe with columns Timestamp (UTC), FixType, NSatellite, Latitude, Longitude, Altitude, HAcc and VAcc, for
+        the solutions with a valid date and time
+    """
+    pvt, _ = scan_ubx(source, chunk_size)
+    pvt = pvt[pvt["valid"]]
+    return pd.DataFrame(
+        {
+            "Timestamp": pd.to_datetime(pvt["time"]),
+            "FixType": pvt["fix_type"],
+            "NSatellite": pvt["num_sv"],
+            "Latitude": pvt["latitude"],
+            "Longitude": pvt["longitude"],
+            "Altitude": pvt["height"],
+            "HAcc": pvt["h_acc"],
+            "VAcc": pvt["v_acc"],
+        }
+    )
@@ -1,10 +1,11 @@
 """
     File containing helpers
 """
-import datetime as dt
 import os
 import logging
 
+from salvo.naming.parser import LEVEL_PATTERN, parse_directory, parse_level, parse_name
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,15 +18,9 @@ def get_site(directory):
     :return site: string
         Site name
     """
-    site = None
-    date_pattern = "%Y%m%d"
-    for subdir in directory.split("/"):
-        try:
-            dt.datetime.strptime(subdir.split("-")[0], date_pattern)
-        except ValueError:
-            pass
-        else:
-            site = subdir.split("-")[1]
+    _, site = parse_directory(directory)
+    if site is not None:
+        site = site.split("-")[0]
     return site
 
 
@@ -38,46 +33,110 @@ def get_date(directory):
     :return site: string
         Date in format YYYYMMDD
     """
-    date = None
-    date_pattern = "%Y%m%d"
-    for subdir in directory.split("/"):
-        try:
-            date = dt.datetime.strptime(subdir.split("-")[0], date_pattern)
-        except ValueError:
-            pass
-        else:
-            date = date.strftime("%Y%m%d")
+    date, _ = parse_directory(directory)
     return date
 
 
-def output_filename(in_fn, level="a"):
+def _output_path(in_fn, level="a"):
     """
-    Generate output filepath base on the input raw filepath. If the file directory does not exist it is created.
-    :param in_fp: str
+    Return the output filepath and processing level of an input filepath, without accessing the file system
+    :param in_fn: str
+        Input filepath
     :param level: str
-    :return: str
-        A string containing the filename in which the output data is writtent
+        Processing grade of the working directory
+    :return out_file, output_level: str, str
+        Output filepath and output processing level
     """
     base_dir = os.path.dirname(in_fn)
     out_dir = base_dir.replace("/raw/", "/working_" + level + "/")
 
     # Input filename
     input_fn = os.path.basename(in_fn)
-    if ".00." in input_fn:
-        output_fn = input_fn.replace(".00.", ".a1.")
-    elif ".a" in input_fn:
-        _increment_number = int(input_fn.split(".")[-2][1:])
-        _next_number = _increment_number + 1
-        if _next_number == 0:
-            # According to ARM guideline a0 is only for raw data exported to NetCDF
-            # https://www.arm.gov/guidance/datause/formatting-and-file-naming-protocols
-            _next_number = 1
-        output_fn = input_fn.replace(
-            f"a{_increment_number:.0f}", f"a{_next_number:.0f}"
-        )
-    out_file = os.path.join(out_dir, output_fn)
-    out_dir = ("/").join(out_file.split("/")[:-1])
+    input_level = parse_level(input_fn)
+    if input_level == "00":
+        output_level = "a1"
+    elif input_level is not None and input_level.startswith("a"):
+        # According to ARM guideline a0 is only for raw data exported to NetCDF
+        # https://www.arm.gov/guidance/datause/formatting-and-file-naming-protocols
+        output_level = f"a{max(int(input_level[1:]) + 1, 1):.0f}"
+    else:
+        raise ValueError(str("Processing level not defined for " + input_fn))
+    output_fn = LEVEL_PATTERN.sub(f".{output_level}.\\g<extension>", input_fn)
+    return os.path.join(out_dir, output_fn), output_level
+
+
+def output_filename(in_fn, level="a"):
+    """
+    Generate output filepath base on the input raw filepath. If the file directory does not exist it is created.
+    :param in_fp: str
+    :param level: str
+    :return: str
+        A string containing the filename in which the output data is writtent
+    """
+    out_file, _ = _output_path(in_fn, level)
+    out_dir = os.path.dirname(out_file)
     if not os.path.exists(out_dir):
         logger.info(str("Creating output file directory: " + out_dir))
         os.makedirs(out_dir)
     return out_file
+
+
+def output_filenames(in_fns, level="a", create_dirs=True):
+    """
+    Generate the output filepaths of many input filepaths at once. Each distinct output directory is listed, and
+    created if needed, only once. Output files colliding with existing products of the same or higher processing
+    level, or with the output file of another input of the batch, are reported before any processing starts.
+    :param in_fns: iterable of str
+        Input filepaths
+    :param level: str
+        Processing grade of the working directory
+    :param create_dirs: boolean, default True
+        If True, create the missing output directories
+    :return out_files, collisions: list of str, dict
+        Output filepaths, in the order of in_fns, and dictionary with the input filepath as key and the list of
+        existing products of the same or higher level, followed by the other inputs with the same output filepath, as
+        value
+    """
+    in_fns = list(in_fns)
+    plans = [_output_path(in_fn, level) for in_fn in in_fns]
+
+    # List each output directory once, grouping existing products by name without level
+    existing = {}
+    for out_dir in sorted({os.path.dirname(out_file) for out_file, _ in plans}):
+        products = {}
+        if os.path.isdir(out_dir):
+            with os.scandir(out_dir) as it:
+                for entry in it:
+                    product_level = parse_level(entry.name)
+                    if product_level is not None and product_level.startswith("a"):
+                        product = LEVEL_PATTERN.sub(".\\g<extension>", entry.name)
+                        products.setdefault(product, []).append(
+                            (int(product_level[1:]), entry.path)
+                        )
+        elif create_dirs:
+            logger.info(str("Creating output file directory: " + out_dir))
+            os.makedirs(out_dir)
+        existing[out_dir] = products
+
+    # Inputs of the batch sharing the same output filepath
+    sources = {}
+    for in_fn, (out_file, _) in zip(in_fns, plans):
+        sources.setdefault(out_file, []).append(in_fn)
+
+    collisions = {}
+    for in_fn, (out_file, output_level) in zip(in_fns, plans):
+        product = LEVEL_PATTERN.sub(".\\g<extension>", os.path.basename(out_file))
+        products = existing[os.path.dirname(out_file)].get(product, [])
+        higher = sorted(fp for n, fp in products if n >= int(output_level[1:]))
+        if higher:
+            logger.warning(
+                str(out_file + " collides with existing products: " + ", ".join(higher))
+            )
+        others = [fn for fn in sources[out_file] if fn != in_fn]
+        if others:
+            logger.warning(
+                str(out_file + " is also the output of: " + ", ".join(others))
+            )
+        if higher or others:
+            collisions[in_fn] = higher + others
+    return [out_file for out_file, _ in plans], collisions
@@ -2,6 +2,7 @@
 File naming for emlid
 """
 import datetime as dt
+import re
 
 INSTRUMENT_DICT = {
     "reachm2": "reachm2-salvo",
@@ -11,6 +12,7 @@ INSTRUMENT_DICT = {
     "CEEbase": "rs2-cee",
 }
 DATE_PATTERNS = {12: "%Y%m%d%H%M", 14: "%Y%m%d%H%M%S"}  # potential date pattern
+DATE_REGEX = re.compile(r"(?:^|_)(\d{14}|\d{12})(?=[._]|$)")
 
 
 def log_type(item):
@@ -59,17 +61,16 @@ def create_emlid_name(input_name, site, location, spl_rate=None):
         l_type += str("%.0f" % spl_rate)
     output_name_l.append("-".join(filter(None, [instrument, l_type])))
 
-    # loop through filename substring for a date
-    for substring in input_name.split("_"):
-        substring = substring.split(".")[0]
-        # check date pattern base on substring length
+    # look for the first filename substring matching a date pattern
+    timestamp = None
+    for match in DATE_REGEX.finditer(input_name):
+        substring = match.group(1)
         try:
             timestamp = dt.datetime.strptime(substring, DATE_PATTERNS[len(substring)])
-        except KeyError:
-            timestamp = None
-        else:
-            timestamp = timestamp.strftime("%Y%m%d-%H%M%S")
-            break
+        except ValueError:
+            continue
+        timestamp = timestamp.strftime("%Y%m%d-%H%M%S")
+        break
     output_name_l.append(timestamp)
     output_name = "_".join(filter(None, output_name_l))
     return output_name
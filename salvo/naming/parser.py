@@ -0,0 +1,160 @@
+"""
+Parser for filenames following the SALVO-2024 nomenclature:
+    salvo_<site>_<location>_<instrument>[-<log type>][-<rate>Hz]_<YYYYMMDD>[-<HHMMSS>].<level>.<extension>
+where the processing level is either 00 (raw), aN (a-grade product) or bN (b-grade product), e.g.
+    salvo_beo_line_magnaprobe-geodel_20240608.a2.csv
+    salvo_ice_ice_reachm2-salvo-event-05Hz_20240530-194700.a1.pos
+Parsed records are memoized, so that every processing stage gets the same parse at no cost.
+The survey date and site are also parsed from the directory tree, e.g. /mnt/data/UAF-data/raw/SALVO/20240608-BEO/
+"""
+import collections
+import datetime as dt
+import functools
+import os
+import re
+
+LOG_TYPES = ["raw", "rinex", "ubx", "llh", "event", "location"]
+
+NAME_PATTERN = re.compile(
+    r"^salvo_(?P<site>[^_.]+)_(?P<location>[^_.]+)_(?P<instrument>[^_.]+)"
+    r"(?:_(?P<date>\d{8})(?:-(?P<time>\d{6}))?(?P<suffix>[a-z]*))?"
+    r"(?:_(?P<tag>[a-z]+))?"
+    r"(?:\.(?P<level>00|[ab]\d+))?"
+    r"(?:\.(?P<extension>[^.]+))?$"
+)
+INSTRUMENT_PATTERN = re.compile(
+    r"^(?P<instrument>.+?)"
+    r"(?:-(?P<log_type>" + "|".join(LOG_TYPES) + r")(?P<rate>\d+)?(?:Hz)?)?"
+    r"(?:-(?P<rate_hz>\d+)Hz)?$"
+)
+DIRECTORY_PATTERN = re.compile(
+    r"^(?P<date>(?:19|20)\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01]))(?:-(?P<site>[^/]*))?$"
+)
+LEVEL_PATTERN = re.compile(r"\.(?P<level>00|[ab]\d+)\.(?P<extension>[^.]+)$")
+
+SalvoName = collections.namedtuple(
+    "SalvoName",
+    [
+        "path",
+        "site",
+        "location",
+        "instrument",
+        "log_type",
+        "sample_rate",
+        "datetime",
+        "level",
+        "extension",
+        "survey_date",
+        "survey_site",
+    ],
+)
+SalvoName.__doc__ = """
+    Structured record of a SALVO filepath
+    :param path: string
+        Input filepath
+    :param site: string or None
+        Site name, e.g. 'arm', 'beo', 'ice'
+    :param location: string or None
+        Location name, e.g. 'line', 'longline', 'library'
+    :param instrument: string or None
+        Instrument name, e.g. 'magnaprobe-geodel', 'reachm2-salvo'
+    :param log_type: string or None
+        Log type, e.g. 'raw', 'rinex', 'ubx', 'event', 'location'
+    :param sample_rate: float or None
+        Sampling rate in Hz
+    :param datetime: dt.datetime or None
+        Date and time of the file
+    :param level: string or None
+        Processing level: '00', 'a1', ..., 'aN' or 'b0', ..., 'bN'
+    :param extension: string or None
+        File extension, without the leading dot
+    :param survey_date: dt.date or None
+        Survey date from the directory tree
+    :param survey_site: string or None
+        Survey site from the directory tree, in lower case
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def parse_directory(directory):
+    """
+    Return the survey date and site from the directory tree, e.g. '/mnt/data/UAF-data/raw/SALVO/20240608-BEO/emlid'
+    :param directory: string
+        Input directory tree
+    :return date, site: string, string
+        Date in format YYYYMMDD and site name as written in the directory name, or None if not found
+    """
+    date, site = None, None
+    for subdir in directory.split("/"):
+        match = DIRECTORY_PATTERN.match(subdir)
+        if match:
+            date, site = match.group("date"), match.group("site")
+    return date, site
+
+
+def parse_level(filename):
+    """
+    Return the processing level of a file
+    :param filename: string
+        Input filename or filepath
+    :return level: string or None
+        Processing level: '00', 'a1', ..., 'aN' or 'b0', ..., 'bN'
+    """
+    match = LEVEL_PATTERN.search(filename)
+    if match:
+        return match.group("level")
+    return None
+
+
+@functools.lru_cache(maxsize=2**16)
+def parse_name(path):
+    """
+    Parse a SALVO filepath into a structured record. Fields that cannot be parsed are set to None.
+    :param path: string
+        Input filepath or filename
+    :return name: SalvoName
+        Structured record of the filepath
+    """
+    directory, filename = os.path.split(path)
+    survey_date, survey_site = parse_directory(directory)
+    if survey_date is not None:
+        survey_date = dt.date(
+            int(survey_date[:4]), int(survey_date[4:6]), int(survey_date[6:])
+        )
+    if survey_site is not None:
+        survey_site = survey_site.lower()
+
+    fields = dict.fromkeys(SalvoName._fields)
+    fields.update(path=path, survey_date=survey_date, survey_site=survey_site)
+
+    match = NAME_PATTERN.match(filename)
+    if match is None:
+        fields["level"] = parse_level(filename)
+        if "." in filename:
+            fields["extension"] = filename.split(".")[-1]
+        return SalvoName(**fields)
+
+    fields.update(
+        site=match.group("site"),
+        location=match.group("location"),
+        level=match.group("level"),
+        extension=match.group("extension"),
+    )
+    instrument = INSTRUMENT_PATTERN.match(match.group("instrument"))
+    fields["instrument"] = instrument.group("instrument")
+    fields["log_type"] = instrument.group("log_type")
+    if match.group("tag") == "events":
+        # EmlidStudio appends _events to the event position file
+        fields["log_type"] = "event"
+    rate = instrument.group("rate_hz") or instrument.group("rate")
+    if rate is not None:
+        fields["sample_rate"] = float(rate)
+
+    if match.group("date") is not None:
+        try:
+            fields["datetime"] = dt.datetime.strptime(
+                match.group("date") + (match.group("time") or "000000"), "%Y%m%d%H%M%S"
+            )
+        except ValueError:
+            pass
+    return SalvoName(**fields)